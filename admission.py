@@ -0,0 +1,165 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from metrics import get_collector
+
+# Admission settings (overridable from the environment for deployment tuning)
+GLOBAL_RATE = float(os.environ.get("ADMISSION_GLOBAL_RATE", 20))        # requests/second
+GLOBAL_BURST = float(os.environ.get("ADMISSION_GLOBAL_BURST", 40))
+SESSION_RATE = float(os.environ.get("ADMISSION_SESSION_RATE", 0.5))     # requests/second
+SESSION_BURST = float(os.environ.get("ADMISSION_SESSION_BURST", 5))
+MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 8))       # concurrent LLM calls
+MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 32))              # requests waiting for a slot
+QUEUE_DEADLINE = float(os.environ.get("ADMISSION_QUEUE_DEADLINE", 10))  # seconds a request may wait
+BATCH_RESERVE = float(os.environ.get("ADMISSION_BATCH_RESERVE", 0.5))   # share of the global burst kept for interactive requests
+BATCH_WAIT = float(os.environ.get("ADMISSION_BATCH_WAIT", 30))          # seconds a batch item backs off before it is shed
+
+# Each worker process has its own buckets, so the global and per-session limits are split between them
+WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+
+SESSION_IDLE_SECONDS = 600  # drop per-session buckets unused for this long
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted"""
+
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, reserve: float = 0.0) -> Tuple[bool, float]:
+        """Take one token, leaving at least reserve behind; return (admitted, seconds until one is available)"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1 + reserve:
+                self.tokens -= 1
+                return True, 0.0
+            return False, (1 + reserve - self.tokens) / self.rate
+
+    def refund(self):
+        """Return a token taken by a request that was shed later on"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class AdmissionController:
+    """Rate limits plus a bounded, deadline-aware queue in front of the LLM calls.
+
+    Runs on the event loop: waiting requests wait on an asyncio semaphore and
+    don't hold a threadpool thread until they are admitted.
+    """
+
+    def __init__(self):
+        self.global_bucket = TokenBucket(GLOBAL_RATE / WORKERS, max(1.0, GLOBAL_BURST / WORKERS))
+        self.session_buckets: Dict[str, TokenBucket] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.avg_service_time = 1.0  # EWMA of seconds per admitted request
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Created on first use so it belongs to the server's event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+        return self._slots
+
+    def _session_bucket(self, session_id: str) -> TokenBucket:
+        bucket = self.session_buckets.get(session_id)
+        if bucket is None:
+            self._prune_sessions()
+            bucket = TokenBucket(SESSION_RATE / WORKERS, max(1.0, SESSION_BURST / WORKERS))
+            self.session_buckets[session_id] = bucket
+        return bucket
+
+    def _prune_sessions(self):
+        cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+        idle = [sid for sid, bucket in self.session_buckets.items() if bucket.updated < cutoff]
+        for sid in idle:
+            del self.session_buckets[sid]
+
+    def _shed(self, status_code: int, retry_after: float, reason: str, taken: Tuple[TokenBucket, ...] = ()):
+        # A shed request doesn't count against the rate limits it passed
+        for bucket in taken:
+            bucket.refund()
+        get_collector().increment(f"admission_shed_{reason}")
+        raise Overloaded(status_code, retry_after, reason)
+
+    def admit_batch_item(self):
+        """Take a global token for one batch item, backing off while the bucket is low.
+
+        Blocks the calling batch thread. Batches only use tokens above the reserve,
+        so a large batch can't starve interactive requests; raises Overloaded once
+        the wait would exceed BATCH_WAIT.
+        """
+        bucket = self.global_bucket
+        reserve = min(bucket.capacity * BATCH_RESERVE, bucket.capacity - 1)
+        deadline = time.monotonic() + BATCH_WAIT
+        while True:
+            ok, retry_after = bucket.try_acquire(reserve)
+            if ok:
+                return
+            if time.monotonic() + retry_after > deadline:
+                self._shed(429, retry_after, "batch_rate_limited")
+            time.sleep(retry_after)
+
+    @asynccontextmanager
+    async def admit(self, session_id: str):
+        """Hold an in-flight slot for the duration of the block, or raise Overloaded"""
+        session_bucket = self._session_bucket(session_id)
+        ok, retry_after = session_bucket.try_acquire()
+        if not ok:
+            self._shed(429, retry_after, "session_rate_limited")
+        ok, retry_after = self.global_bucket.try_acquire()
+        if not ok:
+            self._shed(429, retry_after, "global_rate_limited", (session_bucket,))
+        taken = (session_bucket, self.global_bucket)
+
+        # Expected wait if everyone ahead of us is served at the current pace
+        must_wait = self.in_flight >= MAX_IN_FLIGHT or self.waiting > 0
+        expected_wait = 0.0
+        if must_wait:
+            expected_wait = self.avg_service_time * (self.waiting + 1) / MAX_IN_FLIGHT
+        get_collector().record_value("admission_queue_depth", self.waiting)
+        if must_wait and self.waiting >= MAX_QUEUE:
+            self._shed(503, self.avg_service_time, "queue_full", taken)
+        if expected_wait > QUEUE_DEADLINE:
+            self._shed(503, expected_wait, "deadline", taken)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore().acquire(), QUEUE_DEADLINE)
+        except asyncio.TimeoutError:
+            self._shed(503, self.avg_service_time, "deadline", taken)
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.in_flight -= 1
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * elapsed
+            self._semaphore().release()
+
+
+admission = AdmissionController()
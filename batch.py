@@ -0,0 +1,203 @@
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from uuid import uuid4
+
+from admission import admission, Overloaded
+from chat_engine import get_response
+from crisis import contains_crisis_keywords_batch, SAFETY_MESSAGE
+from logger import log_chat
+from metrics import get_collector
+from models import BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS
+
+# One pool per process, so concurrent batches share BATCH_MAX_CONCURRENCY LLM calls
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    # Created on first use so each forked worker gets its own threads
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY, thread_name_prefix="batch")
+        return _pool
+
+
+def prepare_items(raw_items: List[Dict]) -> List[Dict]:
+    """Number the items, assign sessions and run crisis detection over the whole batch"""
+    flags = contains_crisis_keywords_batch([item["query"] for item in raw_items])
+    batch_id = uuid4().hex[:8]
+    get_collector().record_value("batch_size", len(raw_items))
+    return [
+        {
+            "index": i,
+            "id": item.get("id"),
+            # Items without a session get their own, so they don't share history;
+            # it is single-turn and never persisted
+            "session_id": item.get("session_id") or f"batch-{batch_id}-{i}",
+            "ephemeral": not item.get("session_id"),
+            "query": item["query"],
+            "crisis": flag
+        }
+        for i, (item, flag) in enumerate(zip(raw_items, flags))
+    ]
+
+
+def _crisis_result(item: Dict) -> Dict:
+    log_chat(item["session_id"], item["query"], SAFETY_MESSAGE, is_crisis=True)
+    return {"response": SAFETY_MESSAGE, "crisis": True}
+
+
+def _run_groups(groups: List[List[Dict]], handle: Callable[[Dict], Dict], concurrency: int) -> Iterator[Dict]:
+    """Run groups in parallel (items within a group in order) and yield results as they complete"""
+    results: queue.Queue = queue.Queue()
+    pending: queue.SimpleQueue = queue.SimpleQueue()
+    for group in groups:
+        pending.put(group)
+    total = sum(len(group) for group in groups)
+    stopped = threading.Event()
+
+    def run_groups():
+        # Each runner holds one shared pool thread and works through the batch's groups
+        while not stopped.is_set():
+            try:
+                group = pending.get_nowait()
+            except queue.Empty:
+                return
+            for item in group:
+                if stopped.is_set():
+                    return
+                try:
+                    result = handle(item)
+                except Overloaded as e:
+                    result = {"error": e.reason, "status": e.status_code, "retry_after": e.retry_after}
+                except Exception as e:
+                    result = {"error": str(e)}
+                result.update(index=item["index"], id=item["id"])
+                results.put(result)
+
+    for _ in range(max(1, min(concurrency, BATCH_MAX_CONCURRENCY, len(groups)))):
+        _executor().submit(run_groups)
+    try:
+        for _ in range(total):
+            get_collector().increment("batch_items")
+            yield results.get()
+    finally:
+        # Stop picking up work if the consumer goes away early
+        stopped.set()
+
+
+def run_chat_batch(raw_items: List[Dict], concurrency: int = 8) -> Iterator[Dict]:
+    """Answer a batch through the conversational engine"""
+    items = prepare_items(raw_items)
+
+    def handle(item: Dict) -> Dict:
+        if item["crisis"]:
+            return _crisis_result(item)
+        admission.admit_batch_item()
+        response = get_response(item["session_id"], item["query"], persist=not item["ephemeral"])
+        log_chat(item["session_id"], item["query"], response, is_crisis=False)
+        return {"response": response, "crisis": False}
+
+    # Turns in the same session must run in order; different sessions run in parallel
+    sessions: Dict[str, List[Dict]] = OrderedDict()
+    for item in items:
+        sessions.setdefault(item["session_id"], []).append(item)
+    return _run_groups(list(sessions.values()), handle, concurrency)
+
+
+def run_doc_batch(raw_items: List[Dict], concurrency: int = 8) -> Iterator[Dict]:
+    """Answer a batch through the document engine, embedding all queries up front"""
+    from doc_engine import query_documents, embed_queries
+
+    items = prepare_items(raw_items)
+    pending = [item for item in items if not item["crisis"]]
+    if pending:
+        for item, embedding in zip(pending, embed_queries([item["query"] for item in pending])):
+            item["embedding"] = embedding
+
+    def handle(item: Dict) -> Dict:
+        if item["crisis"]:
+            return _crisis_result(item)
+        admission.admit_batch_item()
+        return {"response": str(query_documents(item["query"], item["embedding"])), "crisis": False}
+
+    return _run_groups([[item] for item in items], handle, concurrency)
+
+
+def to_ndjson(results: Iterable[Dict]) -> Iterator[str]:
+    for result in results:
+        yield json.dumps(result) + "\n"
+
+
+def _read_jsonl(path: str, query_field: str, id_field: str) -> List[Dict]:
+    items = []
+    with open(path, 'r', encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            items.append({
+                "id": record.get(id_field),
+                "session_id": record.get("session_id"),
+                "query": record[query_field]
+            })
+    return items
+
+
+def _post_batch(url: str, items: List[Dict], concurrency: int) -> Iterator[Dict]:
+    import requests
+
+    # The server accepts at most BATCH_MAX_ITEMS per request
+    for offset in range(0, len(items), BATCH_MAX_ITEMS):
+        chunk = items[offset:offset + BATCH_MAX_ITEMS]
+        with requests.post(url, json={"items": chunk, "concurrency": concurrency}, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    result = json.loads(line)
+                    result["index"] += offset
+                    yield result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through the chatbot in bulk")
+    parser.add_argument("input", help="JSONL file, one request per line")
+    parser.add_argument("--mode", choices=["chat", "doc"], default="doc")
+    parser.add_argument("--query-field", default="query", help="field holding the user query")
+    parser.add_argument("--id-field", default="request_id", help="field copied to each result as id")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="NDJSON results file (default: stdout)")
+    parser.add_argument("--url", help="send to a running server (e.g. http://127.0.0.1:8000) instead of in-process")
+    args = parser.parse_args()
+
+    items = _read_jsonl(args.input, args.query_field, args.id_field)
+    start = time.time()
+    if args.url:
+        endpoint = "/chat/batch" if args.mode == "chat" else "/doc-chat/batch"
+        results = _post_batch(args.url.rstrip("/") + endpoint, items, args.concurrency)
+    elif args.mode == "chat":
+        results = run_chat_batch(items, args.concurrency)
+    else:
+        results = run_doc_batch(items, args.concurrency)
+
+    out = open(args.output, 'w', encoding="utf-8") if args.output else sys.stdout
+    errors = 0
+    try:
+        for result in results:
+            errors += "error" in result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.time() - start
+
+    print(f"{len(items)} items in {elapsed:.1f}s ({len(items) / max(elapsed, 1e-9):.1f}/s), {errors} errors", file=sys.stderr)
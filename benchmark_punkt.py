@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+from sentences import build_compact_params
+
+# Each measurement runs in a fresh interpreter so RSS and load time are not shared
+_MEASURE = """
+import json, pickle, time, psutil, nltk.tokenize.punkt
+import sentences
+process = psutil.Process()
+rss_before = process.memory_info().rss
+started = time.perf_counter()
+if {compact}:
+    params = sentences.load_compact_params({language!r})
+else:
+    with open(sentences._source_pickle({language!r}), "rb") as f:
+        params = pickle.load(f)._params
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "rss_mb": (process.memory_info().rss - rss_before) / 1024 / 1024}}))
+"""
+
+def measure(language: str, compact: bool) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _MEASURE.format(language=language, compact=compact)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    return json.loads(result.stdout)
+
+def benchmark(languages: List[str], repeats: int) -> List[Dict]:
+    rows = []
+    for language in languages:
+        build_compact_params(language)
+        pickle_runs = [measure(language, compact=False) for _ in range(repeats)]
+        compact_runs = [measure(language, compact=True) for _ in range(repeats)]
+        rows.append({
+            "language": language,
+            "pickle_seconds": min(r["seconds"] for r in pickle_runs),
+            "pickle_rss_mb": min(r["rss_mb"] for r in pickle_runs),
+            "compact_seconds": min(r["seconds"] for r in compact_runs),
+            "compact_rss_mb": min(r["rss_mb"] for r in compact_runs)
+        })
+    return rows
+
+def format_results(rows: List[Dict]) -> str:
+    report = f"{'language':<12} {'pickle load':>12} {'compact load':>13} {'speedup':>8} {'pickle RSS':>11} {'compact RSS':>12}\n"
+    for r in rows:
+        speedup = r["pickle_seconds"] / max(r["compact_seconds"], 1e-9)
+        report += (f"{r['language']:<12} {r['pickle_seconds'] * 1000:>10.1f}ms {r['compact_seconds'] * 1000:>11.1f}ms "
+                   f"{speedup:>7.1f}x {r['pickle_rss_mb']:>9.1f}MB {r['compact_rss_mb']:>10.1f}MB\n")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Punkt load time and RSS: pickle vs compact cache")
+    parser.add_argument("languages", nargs="*", default=["english", "german", "spanish"])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(format_results(benchmark(args.languages, args.repeats)))
@@ -0,0 +1,96 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+from test_endpoints import wait_for_server
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    """Start gunicorn with the given number of workers"""
+    env = dict(os.environ)
+    env["WEB_CONCURRENCY"] = str(workers)
+    env["PORT"] = str(port)
+    # Keep admission control out of the way so we measure raw capacity, not shedding
+    for setting in ["GLOBAL_RATE", "GLOBAL_BURST", "SESSION_RATE", "SESSION_BURST",
+                    "MAX_IN_FLIGHT", "MAX_QUEUE", "QUEUE_DEADLINE"]:
+        env[f"ADMISSION_{setting}"] = "100000"
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+def run_load(base_url: str, endpoint: str, total_requests: int, concurrency: int,
+             method: str = "POST") -> Dict:
+    """Fire total_requests at the endpoint and measure throughput of successful responses"""
+    def send(i: int) -> int:
+        response = requests.request(
+            method,
+            f"{base_url}{endpoint}",
+            json={"session_id": f"bench_{i}", "query": "How can I manage exam stress?"} if method == "POST" else None
+        )
+        return response.status_code
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        status_codes = list(pool.map(send, range(total_requests)))
+    elapsed = time.time() - start
+
+    # Shed (429/503) and failed responses are not served requests
+    ok = status_codes.count(200)
+    return {
+        "elapsed": elapsed,
+        "throughput": ok / elapsed,
+        "ok": ok,
+        "failed": total_requests - ok
+    }
+
+def benchmark(worker_counts: List[int], endpoint: str, total_requests: int,
+              concurrency: int, port: int, method: str = "POST") -> List[Dict]:
+    results = []
+    base_url = f"http://127.0.0.1:{port}"
+    for workers in worker_counts:
+        server = start_server(workers, port)
+        try:
+            if not wait_for_server(base_url, timeout=300):
+                print(f"Server with {workers} workers did not start")
+                continue
+            run_load(base_url, endpoint, concurrency, concurrency, method)  # warm-up
+            result = run_load(base_url, endpoint, total_requests, concurrency, method)
+            result["workers"] = workers
+            results.append(result)
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+def format_results(results: List[Dict]) -> str:
+    if not results or results[0]["throughput"] == 0:
+        return "No successful requests."
+
+    baseline = results[0]["throughput"] / results[0]["workers"]
+    report = f"{'workers':>8} {'ok req/s':>10} {'speedup':>8} {'efficiency':>11} {'ok':>6} {'failed':>7}\n"
+    for r in results:
+        speedup = r["throughput"] / results[0]["throughput"]
+        efficiency = r["throughput"] / (baseline * r["workers"]) * 100
+        report += f"{r['workers']:>8} {r['throughput']:>10.2f} {speedup:>7.2f}x {efficiency:>10.1f}% {r['ok']:>6} {r['failed']:>7}\n"
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure throughput scaling from 1 to N workers")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--endpoint", default="/chat")
+    parser.add_argument("--method", default="POST", choices=["GET", "POST"])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    results = benchmark(worker_counts, args.endpoint, args.requests, args.concurrency, args.port, args.method)
+    print(format_results(results))
@@ -1,34 +1,41 @@
 import os
 os.environ["TRANSFORMERS_NO_TF"] = "1"
-import google.generativeai as genai
-import os
+import threading
+from typing import Iterator
 from dotenv import load_dotenv
+from session_store import SessionStore
 
 # Load environment variables
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is not found. Check the .env file.")
+# The Gemini client is created on first use so importing this module stays cheap
+_model = None
+_model_lock = threading.Lock()
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if not GEMINI_API_KEY:
+                    raise ValueError("GEMINI_API_KEY is not found. Check the .env file.")
 
-# Choose model (flash = faster, pro = better)
-model = genai.GenerativeModel("gemini-1.5-flash")
+                import google.generativeai as genai
 
-# Session memory for chat history
-session_memory_map = {}
+                # Configure Gemini API
+                genai.configure(api_key=GEMINI_API_KEY)
 
-def get_response(session_id: str, user_query: str):
-    # Initialize chat history for session
-    if session_id not in session_memory_map:
-        session_memory_map[session_id] = []
+                # Choose model (flash = faster, pro = better)
+                _model = genai.GenerativeModel("gemini-1.5-flash")
+    return _model
 
-    session_memory_map[session_id].append({"role": "user", "parts": [user_query]})
+# Session memory for chat history, shared by all worker processes
+session_store = SessionStore()
 
+def build_prompt(user_query: str) -> str:
     # Wrap the latest user query in an empathetic prompt
-    prompt = (
+    return (
         "You are a kind and supportive mental health assistant. "
         "Respond with empathy and offer thoughtful advice or comfort. "
         "Here's what the user shared:\n\n"
@@ -36,13 +43,31 @@ def get_response(session_id: str, user_query: str):
         "Please provide a gentle, caring response."
     )
 
+def get_response(session_id: str, user_query: str, persist: bool = True):
+    """Gemini's answer given the session's history; persist=False leaves the session untouched"""
+    history = session_store.get_history(session_id) if persist else []
+
     # Add the wrapped prompt as the last user message
-    session_memory_map[session_id][-1] = {"role": "user", "parts": [prompt]}
+    user_message = {"role": "user", "parts": [build_prompt(user_query)]}
 
     # Generate response with full history
-    response = model.generate_content(session_memory_map[session_id])
+    response = get_model().generate_content(history + [user_message])
 
-    # Append model response to history
-    session_memory_map[session_id].append({"role": "model", "parts": [response.text]})
+    # Append the exchange to the stored history
+    if persist:
+        session_store.append(session_id, [user_message, {"role": "model", "parts": [response.text]}])
 
     return response.text
+
+def stream_response(session_id: str, user_query: str) -> Iterator[str]:
+    """Like get_response, but yields the response text as Gemini produces it"""
+    history = session_store.get_history(session_id)
+    user_message = {"role": "user", "parts": [build_prompt(user_query)]}
+
+    parts = []
+    for chunk in get_model().generate_content(history + [user_message], stream=True):
+        parts.append(chunk.text)
+        yield chunk.text
+
+    # Only store the exchange once the full response has arrived
+    session_store.append(session_id, [user_message, {"role": "model", "parts": ["".join(parts)]}])
@@ -1,5 +1,6 @@
 import os
 os.environ["TRANSFORMERS_NO_TF"] = "1"
+import re
 from typing import List
 
 CRISIS_KEYWORDS: List[str] = [
@@ -19,4 +20,11 @@ SAFETY_MESSAGE = (
 
 def contains_crisis_keywords(text: str) -> bool:
     text_lower = text.lower()
-    return any(keyword in text_lower for keyword in CRISIS_KEYWORDS)
\ No newline at end of file
+    return any(keyword in text_lower for keyword in CRISIS_KEYWORDS)
+
+# Single alternation so a batch is scanned in one regex pass per message
+_CRISIS_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in CRISIS_KEYWORDS))
+
+def contains_crisis_keywords_batch(texts: List[str]) -> List[bool]:
+    search = _CRISIS_PATTERN.search
+    return [search(text.lower()) is not None for text in texts]
@@ -8,9 +8,15 @@ Settings.llm = None
 import os
 from dotenv import load_dotenv
 from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
-from llama_index.core import StorageContext, load_index_from_storage
+from llama_index.core import StorageContext, load_index_from_storage, QueryBundle
+from llama_index.core.node_parser import SentenceSplitter
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from typing import List, Optional
 import google.generativeai as genai
+from metrics import get_collector
+from retrieval import CANDIDATE_TOP_K, compress_context, estimate_tokens
+from singleflight import SingleFlight
+from sentences import chunk_sentences
 
 # Load environment variables
 load_dotenv()
@@ -35,42 +41,89 @@ try:
     else:
         if os.path.exists("data"):
             documents = SimpleDirectoryReader("data").load_data()
-            index = VectorStoreIndex.from_documents(documents, embed_model=embed_model)
+            # Chunk on sentence boundaries from the cached Punkt model
+            splitter = SentenceSplitter(chunking_tokenizer_fn=chunk_sentences)
+            index = VectorStoreIndex.from_documents(documents, embed_model=embed_model, transformations=[splitter])
             index.storage_context.persist(persist_dir=PERSIST_DIR)
         else:
             index = None
     
     if index:
-        query_engine = index.as_query_engine(llm=None)
+        retriever = index.as_retriever(similarity_top_k=CANDIDATE_TOP_K)
     else:
-        query_engine = None
+        retriever = None
         
 except Exception as e:
     print(f"Warning: Could not initialize document index: {e}")
-    query_engine = None
+    index = None
+    retriever = None
 
-def query_documents(user_query: str) -> str:
+def _chunk_embeddings(nodes) -> list:
+    """Reuse the embeddings stored in the index, embedding only chunks that lack one"""
+    embeddings = []
+    for node in nodes:
+        embedding = node.node.embedding
+        if embedding is None:
+            try:
+                embedding = index.vector_store.get(node.node.node_id)
+            except Exception:
+                embedding = None
+        embeddings.append(embedding)
+    
+    missing = [i for i, e in enumerate(embeddings) if e is None]
+    if missing:
+        texts = [nodes[i].node.get_content() for i in missing]
+        for i, embedding in zip(missing, embed_model.get_text_embedding_batch(texts)):
+            embeddings[i] = embedding
+    return embeddings
+
+def embed_queries(user_queries: List[str]) -> List[List[float]]:
+    """Embed many queries in one model call"""
+    # all-MiniLM-L6-v2 has no query instruction, so text and query embeddings match
+    return embed_model.get_text_embedding_batch(user_queries)
+
+def retrieve_context(user_query: str, query_embedding: Optional[List[float]] = None) -> str:
+    """Retrieve, deduplicate and trim document chunks for the prompt"""
+    if query_embedding is None:
+        query_embedding = embed_model.get_query_embedding(user_query)
+    nodes = retriever.retrieve(QueryBundle(query_str=user_query, embedding=query_embedding))
+    if not nodes:
+        return ""
+    
+    texts = [node.node.get_content() for node in nodes]
+    return compress_context(query_embedding, texts, _chunk_embeddings(nodes))
+
+# Identical concurrent doc-chat queries share one retrieval + generation call
+doc_flight = SingleFlight("doc_chat")
+
+def _generate_answer(user_query: str, query_embedding: Optional[List[float]] = None) -> str:
+    """Retrieve context and ask Gemini for a response"""
+    # Get context from documents
+    context = retrieve_context(user_query, query_embedding)
+    get_collector().record_value("doc_context_tokens", estimate_tokens(context))
+    
+    # Generate response using Gemini with context
+    prompt = (
+        "You are a supportive and understanding mental health assistant. "
+        "Provide a warm, empathetic, and practical response to help the user with their concern. "
+        "Here is some background information that might help you answer:\n\n"
+        f"{context}\n\n"
+        f"User's concern: {user_query}\n\n"
+        "Respond as if you're offering thoughtful advice to a friend."
+    )
+    
+    response = gemini_model.generate_content(prompt)
+    return response.text
+
+def query_documents(user_query: str, query_embedding: Optional[List[float]] = None) -> str:
     """Query documents with fallback to simple response"""
-    if not query_engine or not gemini_model:
+    if not retriever or not gemini_model:
         return "I'm here to help with your mental health concerns. Could you tell me more about what you're experiencing?"
     
     try:
-        # Get context from documents
-        context = query_engine.query(user_query)
-        
-        # Generate response using Gemini with context
-        prompt = (
-            "You are a supportive and understanding mental health assistant. "
-            "Provide a warm, empathetic, and practical response to help the user with their concern. "
-            "Here is some background information that might help you answer:\n\n"
-            f"{context}\n\n"
-            f"User's concern: {user_query}\n\n"
-            "Respond as if you're offering thoughtful advice to a friend."
-        )
-        
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        # Crisis-flagged messages are never shared with other requests
+        return doc_flight.do_query(user_query, lambda: _generate_answer(user_query, query_embedding))
         
     except Exception as e:
         print(f"Error in query_documents: {e}")
-        return "I'm here to support you. Could you share more about what's on your mind?" 
\ No newline at end of file
+        return "I'm here to support you. Could you share more about what's on your mind?"
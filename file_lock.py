@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+
+@contextmanager
+def locked(path: str):
+    """Hold an exclusive cross-process lock on path + '.lock' for the duration of the block"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
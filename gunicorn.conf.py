@@ -0,0 +1,25 @@
+import os
+
+# Gunicorn settings for multi-worker deployment
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# admission.py reads this to split ADMISSION_GLOBAL_RATE between the workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+
+# Import the app in the master before forking so its modules are shared copy-on-write
+preload_app = True
+
+# Loading the models in the master shares their weights between workers, but on_starting
+# runs before the port is bound, so the health check waits for the download and index
+# build. Off by default: workers then load the models in the background warm-up.
+preload_models = os.environ.get("PRELOAD_MODELS", "0") == "1"
+
+def on_starting(server):
+    if not preload_models:
+        return
+    try:
+        import doc_engine  # noqa: F401
+    except Exception as e:
+        server.log.warning(f"Could not preload doc_engine: {e}")
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import resource
+import time
+from typing import Dict
+
+import requests
+import websockets
+
+def raise_fd_limit(connections: int):
+    """Each connection needs a file descriptor on the client side"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, connections + 256)
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+def server_memory_mb(base_url: str) -> float:
+    metrics = requests.get(f"{base_url}/metrics").json()
+    return metrics["system_metrics"]["current"]["memory_usage_mb"]
+
+async def hold_connection(ws_url: str, hold_seconds: float, stats: Dict):
+    """Open one connection, answer keepalive pings, and stay idle"""
+    try:
+        # No session_id: the server assigns one, so reruns against the same server aren't refused
+        async with websockets.connect(ws_url, ping_interval=None) as ws:
+            json.loads(await ws.recv())  # session greeting
+            stats["open"] += 1
+            stats["peak"] = max(stats["peak"], stats["open"])
+            deadline = time.monotonic() + hold_seconds
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        message = json.loads(await asyncio.wait_for(ws.recv(), deadline - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        break
+                    if message["type"] == "ping":
+                        await ws.send(json.dumps({"type": "pong"}))
+                        stats["pings"] += 1
+            finally:
+                stats["open"] -= 1
+            stats["completed"] += 1
+    except Exception:
+        stats["failed"] += 1
+
+async def run_load_test(base_url: str, connections: int, hold_seconds: float, ramp_per_second: int) -> Dict:
+    ws_url = base_url.replace("http", "ws", 1) + "/ws/chat"
+    stats = {"open": 0, "peak": 0, "completed": 0, "failed": 0, "pings": 0}
+    tasks = []
+    for i in range(connections):
+        tasks.append(asyncio.create_task(hold_connection(ws_url, hold_seconds, stats)))
+        if (i + 1) % ramp_per_second == 0:
+            await asyncio.sleep(1)
+
+    # Sample server memory while every connection is open
+    await asyncio.sleep(1)
+    stats["open_at_sample"] = stats["open"]
+    stats["memory_loaded_mb"] = await asyncio.to_thread(server_memory_mb, base_url)
+
+    await asyncio.gather(*tasks)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hold thousands of idle /ws/chat connections open against one worker")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--hold", type=float, default=60, help="seconds each connection stays open")
+    parser.add_argument("--ramp", type=int, default=500, help="new connections per second")
+    args = parser.parse_args()
+
+    raise_fd_limit(args.connections)
+    memory_before = server_memory_mb(args.base_url)
+    start = time.time()
+    stats = asyncio.run(run_load_test(args.base_url, args.connections, args.hold, args.ramp))
+    elapsed = time.time() - start
+
+    print(f"Connections requested: {args.connections}")
+    print(f"Peak open connections: {stats['peak']}")
+    print(f"Completed: {stats['completed']}, failed: {stats['failed']}")
+    print(f"Keepalive pings answered: {stats['pings']}")
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"Server memory: {memory_before:.1f} MB idle, {stats['memory_loaded_mb']:.1f} MB "
+          f"with {stats['open_at_sample']} connections open")
+    if stats["open_at_sample"]:
+        per_connection_kb = (stats["memory_loaded_mb"] - memory_before) * 1024 / stats["open_at_sample"]
+        print(f"Approximate memory per connection: {per_connection_kb:.1f} KB")
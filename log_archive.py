@@ -0,0 +1,245 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from file_lock import locked
+from logger import LOG_FILE
+from text_column import write_text_column
+
+# Compacted chat logs: one directory per day, each holding column segments
+#   chat_archive/date=YYYY-MM-DD/<segment>/{timestamp,session_codes,crisis,...}.npy
+ARCHIVE_DIR = os.environ.get("CHAT_ARCHIVE_DIR", "chat_archive")
+# Max rows per segment. Rows are buffered as Python strings (query and response text
+# included) until the segment is written, so this bounds compaction's peak memory:
+# at a few KB per row, 50k rows stays in the low hundreds of MB.
+SEGMENT_ROWS = 50_000
+
+
+def _write_segment(path: str, rows: List[List[str]]):
+    if os.path.exists(path):
+        return  # already written by an interrupted earlier run
+
+    staging = f"{path}.tmp"
+    os.makedirs(staging, exist_ok=True)
+
+    sessions: Dict[str, int] = {}
+    columns = {
+        "timestamp": np.array([row[0] for row in rows], dtype="datetime64[us]"),
+        "session_codes": np.fromiter((sessions.setdefault(row[1], len(sessions)) for row in rows),
+                                     dtype=np.int32, count=len(rows)),
+        "crisis": np.array([row[4] == "True" for row in rows], dtype=bool),
+        "query_len": np.array([len(row[2]) for row in rows], dtype=np.int32),
+        "response_len": np.array([len(row[3]) for row in rows], dtype=np.int32),
+    }
+    for name, values in columns.items():
+        np.save(os.path.join(staging, f"{name}.npy"), values)
+    write_text_column(staging, "query", [row[2] for row in rows])
+    write_text_column(staging, "response", [row[3] for row in rows])
+
+    with open(os.path.join(staging, "sessions.json"), "w", encoding="utf-8") as f:
+        json.dump(list(sessions), f)
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump({
+            "rows": len(rows),
+            "min_timestamp": str(columns["timestamp"].min()),
+            "max_timestamp": str(columns["timestamp"].max()),
+            "crisis_rows": int(columns["crisis"].sum())
+        }, f)
+    os.rename(staging, path)
+
+
+def compact(log_file: str = LOG_FILE, archive_dir: str = ARCHIVE_DIR, segment_rows: int = SEGMENT_ROWS) -> int:
+    """Move the chat log CSV into day-partitioned column segments; returns rows compacted"""
+    pending = f"{log_file}.compacting"
+    if not os.path.exists(pending):
+        # Rotate under the writers' lock; log_chat starts a fresh CSV on its next write
+        with locked(log_file):
+            if not os.path.exists(log_file):
+                return 0
+            os.replace(log_file, pending)
+
+    # Segment names derive from the rotated file, so a retry after a crash skips finished segments
+    stat = os.stat(pending)
+    compaction_id = hashlib.sha1(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+
+    total = 0
+    segment = 0
+    buffer: List[List[str]] = []
+    day = None
+
+    def flush():
+        nonlocal segment
+        partition = os.path.join(archive_dir, f"date={day}")
+        os.makedirs(partition, exist_ok=True)
+        _write_segment(os.path.join(partition, f"{compaction_id}-{segment:04d}"), buffer)
+        segment += 1
+
+    with open(pending, newline='', encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for row in reader:
+            if len(row) != 5:
+                continue
+            row_day = row[0][:10]
+            if buffer and (row_day != day or len(buffer) >= segment_rows):
+                flush()
+                buffer = []
+            day = row_day
+            buffer.append(row)
+            total += 1
+        if buffer:
+            flush()
+
+    os.remove(pending)
+    return total
+
+
+class Segment:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+
+    def column(self, name: str) -> np.ndarray:
+        """Numeric column, memory-mapped so only the pages touched are read"""
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+
+    def sessions(self) -> List[str]:
+        with open(os.path.join(self.path, "sessions.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+
+def scan(archive_dir: str = ARCHIVE_DIR, since: Optional[str] = None, until: Optional[str] = None,
+         crisis: Optional[bool] = None) -> Iterator[Tuple[Segment, np.ndarray]]:
+    """Yield (segment, row mask) for segments that can match the time range and crisis filter"""
+    if not os.path.isdir(archive_dir):
+        return
+    since_ts = np.datetime64(since, "us") if since else None
+    until_ts = np.datetime64(until, "us") if until else None
+
+    for partition in sorted(os.listdir(archive_dir)):
+        if not partition.startswith("date="):
+            continue
+        # Partition pruning on the day in the directory name
+        day = np.datetime64(partition[5:], "D")
+        if since_ts is not None and day < since_ts.astype("datetime64[D]"):
+            continue
+        if until_ts is not None and day > until_ts.astype("datetime64[D]"):
+            continue
+
+        partition_path = os.path.join(archive_dir, partition)
+        for name in sorted(os.listdir(partition_path)):
+            if name.endswith(".tmp"):
+                continue
+            segment = Segment(os.path.join(partition_path, name))
+            meta = segment.meta
+
+            # Segment pruning on min/max timestamp and crisis counts
+            if since_ts is not None and np.datetime64(meta["max_timestamp"]) < since_ts:
+                continue
+            if until_ts is not None and np.datetime64(meta["min_timestamp"]) >= until_ts:
+                continue
+            if crisis is True and meta["crisis_rows"] == 0:
+                continue
+            if crisis is False and meta["crisis_rows"] == meta["rows"]:
+                continue
+
+            mask = np.ones(meta["rows"], dtype=bool)
+            if since_ts is not None or until_ts is not None:
+                timestamps = segment.column("timestamp")
+                if since_ts is not None:
+                    mask &= timestamps >= since_ts
+                if until_ts is not None:
+                    mask &= timestamps < until_ts
+            if crisis is not None:
+                mask &= segment.column("crisis") == crisis
+            yield segment, mask
+
+
+def crisis_rate_by_day(**filters) -> Dict[str, Tuple[int, int]]:
+    """Day -> (messages, crisis messages)"""
+    totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for segment, mask in scan(**filters):
+        days = segment.column("timestamp")[mask].astype("datetime64[D]")
+        flags = segment.column("crisis")[mask]
+        for day, count in zip(*np.unique(days, return_counts=True)):
+            totals[str(day)][0] += int(count)
+        for day, count in zip(*np.unique(days[flags], return_counts=True)):
+            totals[str(day)][1] += int(count)
+    return {day: (total, crises) for day, (total, crises) in sorted(totals.items())}
+
+
+def sessions_per_hour(**filters) -> Dict[str, int]:
+    """Hour -> distinct sessions active in that hour"""
+    active = defaultdict(set)
+    for segment, mask in scan(**filters):
+        hours = segment.column("timestamp")[mask].astype("datetime64[h]")
+        codes = segment.column("session_codes")[mask]
+        if not len(codes):
+            continue
+        # Distinct (hour, session) pairs, sorted by hour, then one set update per hour
+        pairs = np.unique(np.stack([hours.astype(np.int64), codes.astype(np.int64)]), axis=1)
+        names = np.array(segment.sessions(), dtype=object)
+        unique_hours, starts = np.unique(pairs[0], return_index=True)
+        for hour, session_codes in zip(unique_hours, np.split(pairs[1], starts[1:])):
+            active[str(np.datetime64(int(hour), "h"))].update(names[session_codes])
+    return {hour: len(sessions) for hour, sessions in sorted(active.items())}
+
+
+def response_length_stats(**filters) -> Dict[str, float]:
+    """Count, mean, median, p95 and max response length in characters"""
+    histogram = np.zeros(0, dtype=np.int64)
+    for segment, mask in scan(**filters):
+        counts = np.bincount(segment.column("response_len")[mask])
+        if len(counts) > len(histogram):
+            histogram = np.pad(histogram, (0, len(counts) - len(histogram)))
+        histogram[:len(counts)] += counts
+
+    total = int(histogram.sum())
+    if total == 0:
+        return {"count": 0}
+    cumulative = np.cumsum(histogram)
+    lengths = np.arange(len(histogram))
+    return {
+        "count": total,
+        "mean": float((lengths * histogram).sum() / total),
+        "median": int(np.searchsorted(cumulative, total * 0.5)),
+        "p95": int(np.searchsorted(cumulative, total * 0.95)),
+        "max": int(lengths[histogram > 0].max())
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact chat_log.csv and query the columnar archive")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("compact", help="move chat_log.csv into the archive")
+    for name in ["crisis-rate", "sessions-per-hour", "response-lengths"]:
+        query = subparsers.add_parser(name)
+        query.add_argument("--since", help="ISO date/time, inclusive")
+        query.add_argument("--until", help="ISO date/time, exclusive")
+        query.add_argument("--crisis", choices=["true", "false"], help="only crisis / non-crisis messages")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Compacted {compact()} rows into {ARCHIVE_DIR}/")
+    else:
+        filters = {
+            "since": args.since,
+            "until": args.until,
+            "crisis": None if args.crisis is None else args.crisis == "true"
+        }
+        if args.command == "crisis-rate":
+            for day, (total, crises) in crisis_rate_by_day(**filters).items():
+                print(f"{day}  {total:>8} messages  {crises:>6} crisis  {crises / total * 100:6.2f}%")
+        elif args.command == "sessions-per-hour":
+            for hour, count in sessions_per_hour(**filters).items():
+                print(f"{hour}  {count:>6} sessions")
+        else:
+            for key, value in response_length_stats(**filters).items():
+                print(f"{key:>7}: {value}")
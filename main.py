@@ -1,18 +1,31 @@
 import os
 import sys
+import hmac
+import time
+import asyncio
 import logging
+import threading
+from typing import Optional
+from uuid import uuid4
 os.environ["TRANSFORMERS_NO_TF"] = "1"
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 os.environ["NLTK_DATA"] = "/tmp/nltk_data"
+IMPORT_STARTED = time.perf_counter()
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from dotenv import load_dotenv
-from models import ChatRequest
-from chat_engine import get_response
+from models import ChatRequest, BatchChatRequest
+from chat_engine import get_model, get_response, stream_response
 from crisis import contains_crisis_keywords, SAFETY_MESSAGE
 from logger import log_chat
+from metrics import get_collector
+from admission import admission, Overloaded
+from batch import run_chat_batch, run_doc_batch, to_ndjson
+from ws_chat import SessionStream, get_stream, KEEPALIVE_INTERVAL
+from memory_profile import component_report, memory_profiler
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +37,7 @@ logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
 # FastAPI app
 app = FastAPI(
@@ -143,6 +157,18 @@ def read_root():
                 <code>{"session_id": "user123", "query": "stress management tips"}</code>
             </div>
             
+            <div class="endpoint">
+                <h4>POST /chat/batch, POST /doc-chat/batch</h4>
+                <p>Bulk queries; results stream back as NDJSON in completion order</p>
+                <code>{"items": [{"id": "q1", "query": "stress management tips"}], "concurrency": 8}</code>
+            </div>
+            
+            <div class="endpoint">
+                <h4>WebSocket /ws/chat?session_id=user123</h4>
+                <p>Streaming chat over a persistent connection; reconnect with <code>last_seq</code> to resume</p>
+                <code>{"type": "chat", "query": "I feel anxious"}</code>
+            </div>
+            
             <div class="endpoint">
                 <h4>GET /health</h4>
                 <p>Health check endpoint</p>
@@ -162,23 +188,128 @@ def health_check():
         "features": ["crisis_detection", "ai_chat", "session_management", "logging"]
     }
 
+@app.on_event("startup")
+def start_metrics_publisher():
+    # Runs in every worker after the fork, so each one publishes its own snapshot
+    get_collector().start_publisher()
+    get_collector().record_value("startup_import_seconds", IMPORT_SECONDS)
+    get_collector().memory_alert_hooks.append(memory_profiler.capture_on_alert)
+
+def warm_up_models():
+    """Load the Gemini client and document index so the first chat doesn't pay for it"""
+    started = time.perf_counter()
+    try:
+        get_model()
+    except Exception as e:
+        logger.warning(f"Could not initialize Gemini model: {e}")
+    try:
+        import doc_engine  # noqa: F401
+    except Exception as e:
+        logger.warning(f"Could not load doc_engine: {e}")
+    get_collector().record_value("model_warmup_seconds", time.perf_counter() - started)
+    logger.info(f"Models warmed up in {time.perf_counter() - started:.2f}s")
+
+@app.on_event("startup")
+def start_model_warmup():
+    # Heavy modules load in the background; the server answers health checks meanwhile
+    if os.environ.get("WARMUP_MODELS", "1") == "1":
+        threading.Thread(target=warm_up_models, name="model-warmup", daemon=True).start()
+
+@app.get("/metrics")
+def get_metrics():
+    """Current metrics summary, merged across worker processes"""
+    collector = get_collector()
+    collector.record_system_metrics()
+    return collector.get_merged_summary()
+
+def overloaded_response(error: Overloaded) -> JSONResponse:
+    """Fast rejection for a shed request"""
+    return JSONResponse(
+        status_code=error.status_code,
+        content={"error": "Service busy", "message": error.reason},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+async def crisis_response(session_id: str, user_query: str):
+    """Crisis messages skip admission control and get the safety message immediately.
+
+    The log write runs in the loop's default executor, not the request threadpool,
+    so a saturated threadpool can't delay it; a failed write is reported, not raised.
+    """
+    get_collector().increment("admission_crisis_bypass")
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, log_chat, session_id, user_query, SAFETY_MESSAGE, True)
+    except Exception as e:
+        get_collector().increment("crisis_log_failures")
+        logger.error(f"Could not log crisis message for session {session_id}: {str(e)}")
+    return {"response": SAFETY_MESSAGE}
+
+def admin_denied(admin_token: Optional[str]) -> Optional[JSONResponse]:
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set and matches X-Admin-Token"""
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected or not hmac.compare_digest((admin_token or "").encode(), expected.encode()):
+        return JSONResponse(status_code=403, content={"error": "Forbidden"})
+    return None
+
+@app.get("/admin/memory")
+def memory_report(x_admin_token: Optional[str] = Header(None)):
+    """Per-component memory accounting for this worker"""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    report = component_report()
+    report["tracemalloc"] = memory_profiler.tracing
+    report["recent_captures"] = memory_profiler.load_captures()[-5:]
+    return report
+
+@app.post("/admin/memory/tracemalloc/start")
+def start_tracemalloc(x_admin_token: Optional[str] = Header(None)):
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    memory_profiler.start()
+    return {"tracemalloc": True}
+
+@app.post("/admin/memory/tracemalloc/stop")
+def stop_tracemalloc(x_admin_token: Optional[str] = Header(None)):
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    memory_profiler.stop()
+    return {"tracemalloc": False}
+
+@app.get("/admin/memory/diff")
+def tracemalloc_diff(top: int = 20, reset: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Largest allocation changes since tracing started (or the last reset)"""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    try:
+        return {"diff": memory_profiler.diff(top, reset)}
+    except RuntimeError as e:
+        return JSONResponse(status_code=409, content={"error": "Tracing not started", "message": str(e)})
+
 @app.post("/chat")
-def chat_with_memory(request: ChatRequest):
+async def chat_with_memory(request: ChatRequest):
+    # Crisis check and admission run on the event loop; only the LLM call uses a thread
     try:
         session_id = request.session_id
         user_query = request.query
         
         # Crisis check
         if contains_crisis_keywords(user_query):
-            log_chat(session_id, user_query, SAFETY_MESSAGE, is_crisis=True)
-            return {"response": SAFETY_MESSAGE}
+            return await crisis_response(session_id, user_query)
         
         # Get chatbot response
-        response = get_response(session_id, user_query)
-        log_chat(session_id, user_query, response, is_crisis=False)
+        async with admission.admit(session_id):
+            response = await run_in_threadpool(get_response, session_id, user_query)
+        await run_in_threadpool(log_chat, session_id, user_query, response, False)
         
         return {"response": response}
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         return JSONResponse(
@@ -186,16 +317,29 @@ def chat_with_memory(request: ChatRequest):
             content={"error": "Internal server error", "message": str(e)}
         )
 
+def import_query_documents():
+    # Import here to avoid startup issues if doc_engine has problems
+    from doc_engine import query_documents
+    return query_documents
+
 @app.post("/doc-chat")
-def chat_with_documents(request: ChatRequest):
+async def chat_with_documents(request: ChatRequest):
+    if contains_crisis_keywords(request.query):
+        return await crisis_response(request.session_id, request.query)
+    
     try:
-        # Import here to avoid startup issues if doc_engine has problems
-        from doc_engine import query_documents
-        response = query_documents(request.query)
-        return {"response": str(response)}
+        # The first import loads the embedding model, so keep it off the event loop
+        query_documents = await run_in_threadpool(import_query_documents)
     except ImportError:
         logger.warning("doc_engine not available, falling back to regular chat")
-        return chat_with_memory(request)
+        return await chat_with_memory(request)
+    
+    try:
+        async with admission.admit(request.session_id):
+            response = await run_in_threadpool(query_documents, request.query)
+        return {"response": str(response)}
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in doc-chat endpoint: {str(e)}")
         return JSONResponse(
@@ -203,6 +347,124 @@ def chat_with_documents(request: ChatRequest):
             content={"error": "Document chat unavailable", "message": str(e)}
         )
 
+@app.post("/chat/batch")
+def chat_batch(request: BatchChatRequest):
+    items = [item.model_dump() for item in request.items]
+    return StreamingResponse(
+        to_ndjson(run_chat_batch(items, request.concurrency)),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/doc-chat/batch")
+def doc_chat_batch(request: BatchChatRequest):
+    items = [item.model_dump() for item in request.items]
+    try:
+        results = run_doc_batch(items, request.concurrency)
+    except ImportError:
+        logger.warning("doc_engine not available, falling back to regular chat")
+        results = run_chat_batch(items, request.concurrency)
+    return StreamingResponse(to_ndjson(results), media_type="application/x-ndjson")
+
+async def stream_chat_turn(stream: SessionStream, user_query: str):
+    """One chat turn over a WebSocket, with the same crisis and logging behaviour as /chat"""
+    session_id = stream.session_id
+    
+    # Crisis check
+    if contains_crisis_keywords(user_query):
+        result = await crisis_response(session_id, user_query)
+        await stream.send({"type": "done", "response": result["response"]})
+        return
+    
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    
+    def produce():
+        # Runs in a worker thread; hands tokens back to the event loop as they arrive
+        try:
+            for text in stream_response(session_id, user_query):
+                loop.call_soon_threadsafe(events.put_nowait, ("token", text))
+            loop.call_soon_threadsafe(events.put_nowait, ("done", None))
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, ("error", e))
+    
+    try:
+        async with admission.admit(session_id):
+            # Admitted: the slot is held until the generation thread has finished
+            loop.run_in_executor(None, produce)
+            parts = []
+            while True:
+                kind, payload = await events.get()
+                if kind == "token":
+                    parts.append(payload)
+                    await stream.send({"type": "token", "text": payload})
+                elif kind == "done":
+                    break
+                else:
+                    logger.error(f"Error in chat websocket: {str(payload)}")
+                    await stream.send({"type": "error", "status": 500, "message": str(payload)})
+                    return
+    except Overloaded as e:
+        await stream.send({
+            "type": "error",
+            "status": e.status_code,
+            "message": e.reason,
+            "retry_after": e.retry_after
+        })
+        return
+    
+    response = "".join(parts)
+    await run_in_threadpool(log_chat, session_id, user_query, response, False)
+    await stream.send({"type": "done", "response": response})
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None, last_seq: int = 0,
+                         resume_token: Optional[str] = None):
+    """Persistent chat connection bound to one session.
+
+    To resume after a reconnect, pass the resume_token from the session greeting and last_seq.
+    """
+    await websocket.accept()
+    session_id = session_id or uuid4().hex
+    stream = get_stream(session_id, resume_token)
+    if stream is None:
+        await websocket.send_json({"type": "error", "status": 403, "message": "Invalid resume token"})
+        await websocket.close(code=4403)
+        return
+    
+    # A reconnect takes over the session from any previous connection
+    await stream.attach(websocket, last_seq)
+    
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                await stream.send_control(websocket, {"type": "ping"})
+                continue
+            except ValueError:
+                await stream.send_control(websocket, {"type": "error", "status": 400, "message": "Invalid JSON"})
+                continue
+            
+            kind = message.get("type") if isinstance(message, dict) else None
+            if kind == "ping":
+                await stream.send_control(websocket, {"type": "pong"})
+            elif kind == "pong":
+                continue
+            elif kind == "chat" and isinstance(message.get("query"), str) and message["query"].strip():
+                if stream.turn is not None:
+                    await stream.send_control(websocket, {"type": "error", "status": 409, "message": "Turn in progress"})
+                    continue
+                # Generate in the background so pings are still answered; a turn outlives
+                # its connection and its tokens are replayed on reconnect
+                stream.turn = asyncio.ensure_future(stream_chat_turn(stream, message["query"]))
+                stream.turn.add_done_callback(lambda _: setattr(stream, "turn", None))
+            else:
+                await stream.send_control(websocket, {"type": "error", "status": 400, "message": "Unsupported message"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream.detach(websocket)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
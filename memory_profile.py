@@ -0,0 +1,264 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psutil
+
+from file_lock import locked
+from metrics import write_json_atomic
+
+CAPTURES_FILE = Path("memory_captures.json")
+MAX_CAPTURES = 20            # captures kept on disk
+CAPTURE_COOLDOWN = 300       # seconds between automatic captures
+TRACEMALLOC_FRAMES = 10
+ALERT_TRACE_FRAMES = 1       # alert-triggered tracing only needs the allocating line
+ALERT_TRACE_WINDOW = 900     # seconds before alert-triggered tracing is stopped regardless
+DEEP_SIZEOF_LIMIT = 1_000_000  # max objects visited per measurement
+
+_CONTAINERS = (dict, list, tuple, set, frozenset, deque)
+
+# Allocations made by tracemalloc and the import system while snapshotting
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+]
+
+
+def deep_sizeof(obj, limit: int = DEEP_SIZEOF_LIMIT) -> int:
+    """Bytes held by obj and everything reachable through built-in containers"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, _CONTAINERS):
+            stack.extend(current)
+    return total
+
+
+def _sessions() -> Dict:
+    from chat_engine import session_store
+
+    on_disk = sum(os.path.getsize(path) for path in [session_store.path, f"{session_store.path}-wal"]
+                  if os.path.exists(path))
+    report = {"bytes": 0, "on_disk_bytes": on_disk}
+    if "ws_chat" in sys.modules:
+        streams = list(sys.modules["ws_chat"]._streams.values())
+        report["bytes"] = sum(deep_sizeof(stream.buffer) for stream in streams)
+        report["websocket_sessions"] = len(streams)
+    return report
+
+
+def _index_store() -> Optional[Dict]:
+    doc_engine = sys.modules.get("doc_engine")
+    if doc_engine is None or doc_engine.index is None:
+        return None
+
+    index = doc_engine.index
+    embeddings = getattr(getattr(index.vector_store, "data", None), "embedding_dict", {})
+    nodes = index.docstore.docs
+    text_bytes = sum(sys.getsizeof(node.get_content()) for node in nodes.values())
+    return {
+        "bytes": deep_sizeof(embeddings) + text_bytes,
+        "embeddings": len(embeddings),
+        "nodes": len(nodes)
+    }
+
+
+def _parameter_bytes(model) -> int:
+    parameters = getattr(model, "parameters", None)
+    if parameters is None:
+        return 0
+    return sum(p.numel() * p.element_size() for p in parameters())
+
+
+def _model_weights() -> Optional[Dict]:
+    models = {}
+    if "doc_engine" in sys.modules:
+        models["embedding"] = _parameter_bytes(getattr(sys.modules["doc_engine"].embed_model, "_model", None))
+    if "huggingface_engine" in sys.modules:
+        models["gpt2"] = _parameter_bytes(sys.modules["huggingface_engine"].model)
+    if not models:
+        return None
+    return {"bytes": sum(models.values()), "models": models}
+
+
+def _metrics() -> Dict:
+    from metrics import get_collector
+
+    collector = get_collector()
+    endpoint_lists = [(m.response_times, m.status_codes) for m in collector.endpoints.values()]
+    return {
+        "bytes": deep_sizeof([endpoint_lists, collector.values, collector.counters]),
+        "endpoints": len(collector.endpoints),
+        "value_series": len(collector.values)
+    }
+
+
+def _admission() -> Optional[Dict]:
+    if "admission" not in sys.modules:
+        return None
+    buckets = sys.modules["admission"].admission.session_buckets
+    return {
+        "bytes": deep_sizeof(buckets) + sum(deep_sizeof(vars(b)) for b in list(buckets.values())),
+        "session_buckets": len(buckets)
+    }
+
+
+_COMPONENTS = {
+    "sessions": _sessions,
+    "index_store": _index_store,
+    "model_weights": _model_weights,
+    "metrics": _metrics,
+    "admission": _admission,
+}
+
+
+def component_report() -> Dict:
+    """Per-component byte accounting; components whose modules aren't loaded are skipped"""
+    rss = psutil.Process().memory_info().rss
+    components = {}
+    for name, measure in _COMPONENTS.items():
+        try:
+            report = measure()
+        except Exception as e:
+            report = {"error": str(e)}
+        if report is not None:
+            components[name] = report
+
+    accounted = sum(c.get("bytes", 0) for c in components.values())
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "pid": os.getpid(),
+        "rss_bytes": rss,
+        "components": components,
+        "unaccounted_bytes": rss - accounted
+    }
+
+
+class MemoryProfiler:
+    """On-demand tracemalloc snapshots; tracing stays off (no overhead) until asked for"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.last_capture = 0.0
+        self.alert_tracing = False  # tracing was started by an alert, not an admin
+        self._alert_timer: Optional[threading.Timer] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = TRACEMALLOC_FRAMES):
+        """Start tracing and take the baseline snapshot later diffs compare against"""
+        with self._lock:
+            self._start(frames)
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+    def diff(self, top: int = 20, reset: bool = False) -> List[Dict]:
+        """Largest allocation changes since the baseline, by source line"""
+        with self._lock:
+            return self._diff(top, reset)
+
+    # The underscored versions expect self._lock to be held
+
+    def _start(self, frames: int):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.alert_tracing = False
+        self.baseline = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def _stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+        self.alert_tracing = False
+
+    def _diff(self, top: int, reset: bool) -> List[Dict]:
+        if not tracemalloc.is_tracing() or self.baseline is None:
+            raise RuntimeError("tracemalloc is not running; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        stats = snapshot.compare_to(self.baseline, "lineno")[:top]
+        if reset:
+            self.baseline = snapshot
+        return [
+            {
+                "location": str(stat.traceback),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count_diff": stat.count_diff
+            }
+            for stat in stats
+        ]
+
+    def _stop_alert_tracing(self):
+        if self._alert_timer is not None:
+            self._alert_timer.cancel()
+            self._alert_timer = None
+        # Leave tracing alone if an admin has taken it over since the alert
+        if self.alert_tracing:
+            self._stop()
+
+    def _alert_window_expired(self):
+        with self._lock:
+            # A timer that lost the race with a follow-up alert must not stop newer tracing
+            if threading.current_thread() is self._alert_timer:
+                self._stop_alert_tracing()
+
+    def capture_on_alert(self, message: str):
+        """Memory alert hook: record accounting and, if tracing, a diff; otherwise start tracing.
+
+        Tracing started here uses a single frame and is stopped after the follow-up
+        capture or ALERT_TRACE_WINDOW seconds, whichever comes first. Tracing an admin
+        started is diffed but left running, with its baseline untouched.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self.last_capture < CAPTURE_COOLDOWN:
+                return
+            self.last_capture = now
+
+            if tracemalloc.is_tracing() and self.baseline is not None:
+                diff = self._diff(20, reset=False)
+                self._stop_alert_tracing()
+            else:
+                # The next alert will have a diff against this point
+                self._stop_alert_tracing()
+                self._start(ALERT_TRACE_FRAMES)
+                self.alert_tracing = True
+                self._alert_timer = threading.Timer(ALERT_TRACE_WINDOW, self._alert_window_expired)
+                self._alert_timer.daemon = True
+                self._alert_timer.start()
+                diff = None
+
+        capture = {"alert": message, "report": component_report(), "diff": diff}
+        with locked(str(CAPTURES_FILE)):
+            captures = self.load_captures()
+            captures.append(capture)
+            write_json_atomic(CAPTURES_FILE, captures[-MAX_CAPTURES:], indent=2)
+
+    def load_captures(self) -> List[Dict]:
+        if not CAPTURES_FILE.exists():
+            return []
+        with open(CAPTURES_FILE, 'r') as f:
+            return json.load(f)
+
+
+memory_profiler = MemoryProfiler()
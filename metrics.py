@@ -1,12 +1,19 @@
+import os
 import time
+import threading
 import psutil
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from statistics import mean, median
 from dataclasses import dataclass
 from collections import defaultdict
+from file_lock import locked
+
+# Each worker process publishes a snapshot of its in-memory metrics here
+WORKER_SNAPSHOT_DIR = Path(os.environ.get("METRICS_WORKER_DIR", "metrics_workers"))
+SNAPSHOT_INTERVAL = 5  # seconds between snapshot publications
 
 @dataclass
 class AlertConfig:
@@ -14,6 +21,14 @@ class AlertConfig:
     memory_threshold: float = 1024  # MB
     cpu_threshold: float = 80.0  # percent
 
+def write_json_atomic(path: Path, data, indent: Optional[int] = None):
+    """Write JSON via a temp file and rename, so readers never see a partial file"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+
 class EndpointMetrics:
     def __init__(self):
         self.response_times = []
@@ -59,22 +74,32 @@ class MetricsCollector:
         self.endpoints = defaultdict(EndpointMetrics)
         self.system_metrics_history = []
         self.max_history_points = 60  # Keep last 60 measurements
+        self.values = defaultdict(list)
+        self.max_value_points = 1000  # Keep last 1000 samples per named value
+        self.counters = defaultdict(int)
+        self.memory_alert_hooks: List[Callable[[str], None]] = []
         
         # Initialize files if they don't exist
         self._initialize_files()
     
     def _initialize_files(self):
-        if not self.metrics_file.exists():
-            self.save_metrics({
-                "requests": [],
-                "system_metrics": []
-            })
-        if not self.alerts_file.exists():
-            self._save_alerts([])
+        with locked(str(self.metrics_file)):
+            if not self.metrics_file.exists():
+                self.save_metrics({
+                    "requests": [],
+                    "system_metrics": []
+                })
+        with locked(str(self.alerts_file)):
+            if not self.alerts_file.exists():
+                self._save_alerts([])
     
     def record_request(self, endpoint: str, response_time: float, status_code: int):
         """Record metrics for a single request"""
-        metrics = self.load_metrics()
+        # Record in endpoint-specific metrics
+        self.endpoints[endpoint].add_request(response_time, status_code)
+        
+        # Check for alerts
+        self._check_response_time_alert(endpoint, response_time)
         
         # Record in time-series data
         request_metric = {
@@ -83,15 +108,33 @@ class MetricsCollector:
             "response_time": response_time,
             "status_code": status_code
         }
-        metrics["requests"].append(request_metric)
-        
-        # Record in endpoint-specific metrics
-        self.endpoints[endpoint].add_request(response_time, status_code)
-        
-        # Check for alerts
-        self._check_response_time_alert(endpoint, response_time)
-        
-        self.save_metrics(metrics)
+        with locked(str(self.metrics_file)):
+            metrics = self.load_metrics()
+            metrics["requests"].append(request_metric)
+            self.save_metrics(metrics)
+    
+    def record_value(self, name: str, value: float):
+        """Record a sample of a named per-request value (kept in memory only)"""
+        samples = self.values[name]
+        samples.append(value)
+        if len(samples) > self.max_value_points:
+            del samples[:-self.max_value_points]
+    
+    def increment(self, name: str, amount: int = 1):
+        """Increment a named counter (kept in memory only)"""
+        self.counters[name] += amount
+    
+    def _summarize_values(self, values: Dict) -> Dict:
+        """Summary statistics for each named value"""
+        return {
+            name: {
+                "count": len(samples),
+                "avg": mean(samples),
+                "median": median(samples),
+                "max": max(samples)
+            }
+            for name, samples in values.items() if samples
+        }
     
     def record_system_metrics(self):
         """Record system-level metrics"""
@@ -102,21 +145,23 @@ class MetricsCollector:
             "timestamp": current_time.isoformat(),
             "cpu_percent": process.cpu_percent(),
             "memory_usage_mb": process.memory_info().rss / 1024 / 1024,
-            "uptime_seconds": time.time() - self.start_time
+            "uptime_seconds": time.time() - self.start_time,
+            "pid": os.getpid()
         }
         
-        # Add to time-series data
-        metrics = self.load_metrics()
-        metrics["system_metrics"].append(system_metric)
-        
-        # Keep only recent history
-        if len(metrics["system_metrics"]) > self.max_history_points:
-            metrics["system_metrics"] = metrics["system_metrics"][-self.max_history_points:]
-        
         # Check for system alerts
         self._check_system_alerts(system_metric)
         
-        self.save_metrics(metrics)
+        # Add to time-series data
+        with locked(str(self.metrics_file)):
+            metrics = self.load_metrics()
+            metrics["system_metrics"].append(system_metric)
+            
+            # Keep only recent history
+            if len(metrics["system_metrics"]) > self.max_history_points:
+                metrics["system_metrics"] = metrics["system_metrics"][-self.max_history_points:]
+            
+            self.save_metrics(metrics)
     
     def _check_response_time_alert(self, endpoint: str, response_time: float):
         """Check if response time exceeds threshold and record alert"""
@@ -127,23 +172,109 @@ class MetricsCollector:
     def _check_system_alerts(self, metrics: Dict):
         """Check system metrics for alert conditions"""
         if metrics["memory_usage_mb"] > self.alert_config.memory_threshold:
-            self._record_alert(f"High memory usage: {metrics['memory_usage_mb']:.2f}MB")
+            message = f"High memory usage: {metrics['memory_usage_mb']:.2f}MB"
+            self._record_alert(message)
+            for hook in self.memory_alert_hooks:
+                try:
+                    hook(message)
+                except Exception as e:
+                    print(f"Warning: Memory alert hook failed: {e}")
         
         if metrics["cpu_percent"] > self.alert_config.cpu_threshold:
             self._record_alert(f"High CPU usage: {metrics['cpu_percent']:.2f}%")
     
     def _record_alert(self, message: str):
         """Record an alert message"""
-        alerts = self._load_alerts()
-        alerts.append({
-            "timestamp": datetime.now().isoformat(),
-            "message": message
-        })
-        self._save_alerts(alerts)
+        with locked(str(self.alerts_file)):
+            alerts = self._load_alerts()
+            alerts.append({
+                "timestamp": datetime.now().isoformat(),
+                "message": message
+            })
+            self._save_alerts(alerts)
     
     def get_summary(self) -> Dict:
-        """Get a comprehensive summary of all metrics"""
+        """Get a comprehensive summary of this process's metrics"""
+        return self._build_summary(self.endpoints, self.values, self.counters)
+    
+    def publish_snapshot(self):
+        """Write this worker's in-memory metrics where other workers can merge them"""
+        snapshot = {
+            "pid": os.getpid(),
+            "start_time": self.start_time,
+            "endpoints": {
+                endpoint: {
+                    "response_times": metrics.response_times,
+                    "status_codes": metrics.status_codes,
+                    "alert_count": metrics.alert_count,
+                    "last_request_time": metrics.last_request_time.isoformat() if metrics.last_request_time else None
+                }
+                for endpoint, metrics in self.endpoints.items()
+            },
+            "values": self.values,
+            "counters": self.counters
+        }
+        WORKER_SNAPSHOT_DIR.mkdir(exist_ok=True)
+        path = WORKER_SNAPSHOT_DIR / f"worker-{os.getpid()}.json"
+        write_json_atomic(path, snapshot)
+    
+    def start_publisher(self, interval: float = SNAPSHOT_INTERVAL):
+        """Publish snapshots periodically from a daemon thread (call once per worker)"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.publish_snapshot()
+                except Exception as e:
+                    print(f"Warning: Could not publish metrics snapshot: {e}")
+        
+        threading.Thread(target=run, name="metrics-publisher", daemon=True).start()
+    
+    def get_merged_summary(self) -> Dict:
+        """Summary across all live worker processes"""
+        self.publish_snapshot()
+        
+        endpoints = defaultdict(EndpointMetrics)
+        values = defaultdict(list)
+        counters = defaultdict(int)
+        workers = 0
+        start_time = self.start_time
+        for path in WORKER_SNAPSHOT_DIR.glob("worker-*.json"):
+            try:
+                with open(path, 'r') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not psutil.pid_exists(snapshot["pid"]):
+                path.unlink(missing_ok=True)
+                continue
+            
+            workers += 1
+            start_time = min(start_time, snapshot["start_time"])
+            for endpoint, data in snapshot["endpoints"].items():
+                merged = endpoints[endpoint]
+                merged.response_times.extend(data["response_times"])
+                merged.status_codes.extend(data["status_codes"])
+                merged.alert_count += data["alert_count"]
+                if data["last_request_time"]:
+                    last = datetime.fromisoformat(data["last_request_time"])
+                    if merged.last_request_time is None or last > merged.last_request_time:
+                        merged.last_request_time = last
+            for name, samples in snapshot["values"].items():
+                values[name].extend(samples)
+            for name, count in snapshot["counters"].items():
+                counters[name] += count
+        
+        summary = self._build_summary(endpoints, values, counters, start_time)
+        summary["general"]["workers"] = workers
+        return summary
+    
+    def _build_summary(self, endpoints: Dict, values: Dict, counters: Dict,
+                       start_time: Optional[float] = None) -> Dict:
+        """Build the summary structure from endpoint metrics, values and counters"""
+        start_time = start_time or self.start_time
         metrics = self.load_metrics()
+        alerts = self._load_alerts()
         
         # Get the latest system metrics
         latest_system_metrics = metrics["system_metrics"][-1] if metrics["system_metrics"] else None
@@ -154,19 +285,21 @@ class MetricsCollector:
         return {
             "endpoints": {
                 endpoint: metrics.get_stats()
-                for endpoint, metrics in self.endpoints.items()
+                for endpoint, metrics in endpoints.items()
             },
             "system_metrics": {
                 "current": latest_system_metrics,
                 "trends": system_metrics_trend
             },
             "alerts": {
-                "total_alerts": sum(endpoint.alert_count for endpoint in self.endpoints.values()),
-                "recent_alerts": self._load_alerts()[-5:] if self._load_alerts() else []
+                "total_alerts": sum(endpoint.alert_count for endpoint in endpoints.values()),
+                "recent_alerts": alerts[-5:]
             },
+            "values": self._summarize_values(values),
+            "counters": dict(counters),
             "general": {
-                "uptime_seconds": time.time() - self.start_time,
-                "start_time": datetime.fromtimestamp(self.start_time).isoformat()
+                "uptime_seconds": time.time() - start_time,
+                "start_time": datetime.fromtimestamp(start_time).isoformat()
             }
         }
     
@@ -199,8 +332,7 @@ class MetricsCollector:
     
     def save_metrics(self, metrics: Dict):
         """Save metrics to file"""
-        with open(self.metrics_file, 'w') as f:
-            json.dump(metrics, f, indent=2)
+        write_json_atomic(self.metrics_file, metrics, indent=2)
     
     def _load_alerts(self) -> List:
         """Load alerts from file"""
@@ -212,5 +344,14 @@ class MetricsCollector:
     
     def _save_alerts(self, alerts: List):
         """Save alerts to file"""
-        with open(self.alerts_file, 'w') as f:
-            json.dump(alerts, f, indent=2) 
\ No newline at end of file
+        write_json_atomic(self.alerts_file, alerts, indent=2)
+
+
+_collector: Optional[MetricsCollector] = None
+
+def get_collector() -> MetricsCollector:
+    """Return the process-wide metrics collector, creating it on first use"""
+    global _collector
+    if _collector is None:
+        _collector = MetricsCollector()
+    return _collector
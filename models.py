@@ -1,7 +1,19 @@
-from pydantic import BaseModel
+from typing import Optional
+from pydantic import BaseModel, conint, conlist
+
+# Batch limits: parallel LLM calls shared by all batches in a worker, and items per request
+BATCH_MAX_CONCURRENCY = 16
+BATCH_MAX_ITEMS = 500
 
 class ChatRequest(BaseModel):
     session_id: str
     query: str
 
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    session_id: Optional[str] = None
+    query: str
 
+class BatchChatRequest(BaseModel):
+    items: conlist(BatchItem, min_length=1, max_length=BATCH_MAX_ITEMS)
+    concurrency: conint(ge=1, le=BATCH_MAX_CONCURRENCY) = 8
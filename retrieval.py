@@ -0,0 +1,100 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from sentences import split_sentences
+
+# Retrieval post-processing settings
+CANDIDATE_TOP_K = 8          # chunks pulled from the index before selection
+MMR_TOP_K = 4                # chunks kept after diversity selection
+MMR_LAMBDA = 0.7             # 1.0 = pure relevance, 0.0 = pure diversity
+DUPLICATE_THRESHOLD = 0.95   # cosine similarity above which chunks are duplicates
+CONTEXT_TOKEN_BUDGET = 512   # max estimated tokens of context passed to the LLM
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def remove_near_duplicates(embeddings: np.ndarray, threshold: float = DUPLICATE_THRESHOLD) -> List[int]:
+    """Return indices of chunks to keep, dropping later chunks that near-duplicate an earlier one"""
+    if len(embeddings) == 0:
+        return []
+
+    unit = _normalize(embeddings)
+    keep: List[int] = []
+    for i in range(len(unit)):
+        if keep and np.max(unit[keep] @ unit[i]) >= threshold:
+            continue
+        keep.append(i)
+    return keep
+
+
+def mmr_select(query_embedding: np.ndarray, embeddings: np.ndarray,
+               top_k: int = MMR_TOP_K, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """Maximal Marginal Relevance: pick chunks relevant to the query but unlike each other"""
+    if len(embeddings) == 0:
+        return []
+
+    unit = _normalize(embeddings)
+    query_sim = unit @ _normalize(query_embedding)
+    pair_sim = unit @ unit.T
+
+    selected: List[int] = []
+    remaining = list(range(len(unit)))
+    while remaining and len(selected) < top_k:
+        if selected:
+            redundancy = pair_sim[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lambda_mult * query_sim[remaining] - (1 - lambda_mult) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def trim_to_budget(chunks: Sequence[str], budget: int = CONTEXT_TOKEN_BUDGET) -> List[str]:
+    """Keep sentences in chunk order until the budget is used up; the sentence that
+    overflows is cut to the remaining budget and nothing after it is kept"""
+    trimmed: List[str] = []
+    used = 0
+    for chunk in chunks:
+        kept = []
+        for sentence in split_sentences(chunk):
+            cost = estimate_tokens(sentence)
+            if used + cost > budget:
+                remaining = budget - used
+                if remaining > 0:
+                    kept.append(sentence[:remaining * 4])
+                used = budget
+                break
+            kept.append(sentence)
+            used += cost
+        if kept:
+            trimmed.append(" ".join(kept))
+        if used >= budget:
+            break
+    return trimmed
+
+
+def compress_context(query_embedding: Sequence[float], texts: Sequence[str],
+                     embeddings: Sequence[Sequence[float]],
+                     budget: Optional[int] = None) -> str:
+    """Deduplicate, diversify and trim retrieved chunks into a single context string"""
+    if not texts:
+        return ""
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    keep = remove_near_duplicates(vectors)
+    order = mmr_select(np.asarray(query_embedding, dtype=np.float32), vectors[keep])
+    selected = [texts[keep[i]] for i in order]
+
+    return "\n\n".join(trim_to_budget(selected, CONTEXT_TOKEN_BUDGET if budget is None else budget))
@@ -0,0 +1,172 @@
+import os
+import pickle
+import shutil
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from file_lock import locked
+from text_column import map_text_column, write_text_column
+
+# Compact Punkt parameters are built once per language and shared by all workers: the
+# ortho context (most of the data) is memory-mapped, keys as one sorted UTF-8 blob plus
+# offsets and values as an int32 array. The word lists are small and loaded per worker.
+PUNKT_CACHE_DIR = os.environ.get("PUNKT_CACHE_DIR", "/tmp/punkt_cache")
+CACHE_VERSION = 2  # bump when the on-disk layout changes
+PUNKT_SOURCE_DIRS = [
+    os.path.join(os.environ.get("NLTK_DATA", "/tmp/nltk_data"), "tokenizers", "punkt", "PY3"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data", "tokenizers", "punkt", "PY3"),
+]
+
+_WORD_LISTS = ["abbrev_types", "sent_starters"]
+
+
+class CompactOrthoContext:
+    """Read-only stand-in for Punkt's ortho_context dict, backed by memory-mapped files"""
+
+    def __init__(self, keys: bytes, offsets: np.ndarray, values: np.ndarray):
+        # Sorted UTF-8 keys: byte order matches code point order, so binary search agrees with sorted(str)
+        self.keys = keys
+        self.offsets = memoryview(offsets)
+        self.values = values
+
+    def _key(self, i: int) -> bytes:
+        return self.keys[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, key: str) -> int:
+        target = key.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._key(lo) == target:
+            return int(self.values[lo])
+        return 0
+
+    def get(self, key: str, default: int = 0) -> int:
+        value = self[key]
+        return value if value else default
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _source_pickle(language: str) -> str:
+    for directory in PUNKT_SOURCE_DIRS:
+        path = os.path.join(directory, f"{language}.pickle")
+        if os.path.exists(path):
+            return path
+    raise LookupError(f"No Punkt model for language '{language}'")
+
+
+def _write_lines(path: str, lines: List[str]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def _read_lines(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return text.split("\n") if text else []
+
+
+def _cache_dir(language: str) -> str:
+    return os.path.join(PUNKT_CACHE_DIR, f"v{CACHE_VERSION}", language)
+
+
+def build_compact_params(language: str) -> str:
+    """Convert the language's Punkt pickle into the compact cache format (done once)"""
+    target = _cache_dir(language)
+    if os.path.exists(target):
+        return target
+
+    with open(_source_pickle(language), "rb") as f:
+        params = pickle.load(f)._params
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = f"{target}.tmp{os.getpid()}"
+    os.makedirs(staging)
+    for name in _WORD_LISTS:
+        _write_lines(os.path.join(staging, f"{name}.txt"), sorted(getattr(params, name)))
+    _write_lines(os.path.join(staging, "collocations.txt"), sorted(f"{a} {b}" for a, b in params.collocations))
+
+    ortho_keys = sorted(params.ortho_context)
+    write_text_column(staging, "ortho_keys", ortho_keys)
+    np.save(os.path.join(staging, "ortho_values.npy"),
+            np.array([params.ortho_context[key] for key in ortho_keys], dtype=np.int32))
+
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another process finished first
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def load_compact_params(language: str):
+    """Punkt parameters for a language from the compact cache, building it if needed"""
+    from nltk.tokenize.punkt import PunktParameters
+
+    target = _cache_dir(language)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with locked(target):
+            build_compact_params(language)
+
+    params = PunktParameters()
+    for name in _WORD_LISTS:
+        setattr(params, name, frozenset(_read_lines(os.path.join(target, f"{name}.txt"))))
+    params.collocations = frozenset(
+        tuple(line.split(" ", 1)) for line in _read_lines(os.path.join(target, "collocations.txt"))
+    )
+    params.ortho_context = CompactOrthoContext(
+        *map_text_column(target, "ortho_keys"),
+        np.load(os.path.join(target, "ortho_values.npy"), mmap_mode="r")
+    )
+    return params
+
+
+_tokenizers: Dict[str, object] = {}
+_tokenizers_lock = threading.Lock()
+
+def get_tokenizer(language: str = "english"):
+    """Punkt sentence tokenizer for a language, loaded on first request"""
+    tokenizer = _tokenizers.get(language)
+    if tokenizer is None:
+        with _tokenizers_lock:
+            tokenizer = _tokenizers.get(language)
+            if tokenizer is None:
+                from nltk.tokenize.punkt import PunktSentenceTokenizer
+
+                tokenizer = PunktSentenceTokenizer(load_compact_params(language))
+                _tokenizers[language] = tokenizer
+    return tokenizer
+
+
+def split_sentences(text: str, language: str = "english") -> List[str]:
+    """Sentences in text, stripped of surrounding whitespace"""
+    return [s.strip() for s in get_tokenizer(language).tokenize(text) if s.strip()]
+
+
+def chunk_sentences(text: str, language: str = "english") -> List[str]:
+    """Sentences with their trailing whitespace kept, so the pieces join back into text"""
+    starts = [start for start, _ in get_tokenizer(language).span_tokenize(text)]
+    if not starts:
+        return [text] if text else []
+    starts[0] = 0
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build compact Punkt parameter caches ahead of time")
+    parser.add_argument("languages", nargs="*", default=["english"])
+    args = parser.parse_args()
+
+    for language in args.languages:
+        print(f"{language}: {build_compact_params(language)}")
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+SESSION_DB = os.environ.get("SESSION_DB", "sessions.db")
+SESSION_TTL = float(os.environ.get("SESSION_TTL_SECONDS", 7 * 24 * 3600))  # drop sessions idle this long
+PRUNE_INTERVAL = 3600  # seconds between pruning passes in each process
+
+
+class SessionStore:
+    """Chat histories in SQLite (WAL mode) so every worker process sees the same sessions"""
+
+    def __init__(self, path: str = SESSION_DB):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = time.monotonic()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " role TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " created REAL NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(messages)")]
+            if "created" not in columns:
+                # Databases from before expiry: their messages count as written now
+                conn.execute("ALTER TABLE messages ADD COLUMN created REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE messages SET created = ?", (time.time(),))
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_history(self, session_id: str) -> List[Dict]:
+        """Messages for a session in Gemini content format"""
+        rows = self._connect().execute(
+            "SELECT role, text FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        return [{"role": role, "parts": [text]} for role, text in rows]
+
+    def append(self, session_id: str, messages: List[Dict]):
+        """Atomically append messages to a session"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, text, created) VALUES (?, ?, ?, ?)",
+                [(session_id, m["role"], m["parts"][0], now) for m in messages]
+            )
+        if time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            self.prune()
+
+    def prune(self, ttl: float = SESSION_TTL) -> int:
+        """Delete sessions with no messages in the last ttl seconds; returns messages removed"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM messages WHERE session_id IN ("
+                " SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created) < ?)",
+                (time.time() - ttl,)
+            )
+            return cursor.rowcount
@@ -0,0 +1,78 @@
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+from crisis import contains_crisis_keywords
+from metrics import get_collector
+
+# Seconds a completed result stays reusable for identical queries
+REUSE_WINDOW = 5.0
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive key, ignoring trailing punctuation"""
+    return _WHITESPACE.sub(" ", query.lower()).strip().rstrip("?!. ")
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key"""
+
+    def __init__(self, name: str, reuse_window: float = REUSE_WINDOW):
+        self.name = name
+        self.reuse_window = reuse_window
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._completed: Dict[str, Tuple[float, str]] = {}
+
+    def do(self, key: str, fn: Callable[[], str]) -> str:
+        """Run fn for key, or wait on / reuse the result of an identical call"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            if key in self._completed:
+                self._count("reused")
+                return self._completed[key][1]
+
+            future: Optional[Future] = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            self._count("coalesced")
+            return future.result()
+
+        self._count("executed")
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            self._completed[key] = (time.monotonic() + self.reuse_window, result)
+        future.set_result(result)
+        return result
+
+    def do_query(self, query: str, fn: Callable[[], str]) -> str:
+        """Coalesce identical user queries; crisis-flagged ones always run on their own"""
+        if contains_crisis_keywords(query):
+            self._count("bypassed")
+            return fn()
+        return self.do(normalize_query(query), fn)
+
+    def _evict_expired(self, now: float):
+        expired = [key for key, (expires, _) in self._completed.items() if expires <= now]
+        for key in expired:
+            del self._completed[key]
+
+    def _count(self, outcome: str):
+        get_collector().increment(f"{self.name}_{outcome}")
@@ -0,0 +1,125 @@
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# "import time:       self [us] | cumulative | imported package"
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _server_env(warmup: bool = False) -> Dict[str, str]:
+    # The repo stays importable when the process runs in another directory
+    pythonpath = os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")]))
+    return {**os.environ, "PYTHONPATH": pythonpath, "WARMUP_MODELS": "1" if warmup else "0"}
+
+
+def profile_imports(module: str = "main", cwd: Optional[str] = None) -> List[Dict]:
+    """Per-module import times for a fresh interpreter importing module (python -X importtime)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        env=_server_env()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "depth": (len(indent) - 1) // 2,
+                "self_seconds": int(self_us) / 1e6,
+                "cumulative_seconds": int(cumulative_us) / 1e6
+            })
+    return entries
+
+
+def total_import_seconds(entries: List[Dict]) -> float:
+    """Wall time of the import, i.e. the sum of top-level cumulative times"""
+    return sum(e["cumulative_seconds"] for e in entries if e["depth"] == 0)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_command(server: str, port: int) -> List[str]:
+    if server == "gunicorn":
+        # The deployed start command, with the repo's gunicorn.conf.py
+        return [sys.executable, "-m", "gunicorn", "main:app", "-c", os.path.join(REPO_DIR, "gunicorn.conf.py"),
+                "--bind", f"127.0.0.1:{port}"]
+    return [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)]
+
+
+def time_to_healthy(port: Optional[int] = None, timeout: float = 120, cwd: Optional[str] = None,
+                    warmup: bool = False, server: str = "uvicorn", workers: int = 2) -> float:
+    """Seconds from launching the server until /health first answers 200.
+
+    Model warm-up is off by default so the measurement (and any test using it)
+    doesn't download models or build the document index; pass cwd to keep the
+    server's session database and metrics files out of the checkout. server is
+    "uvicorn" or "gunicorn" (run with workers worker processes).
+    """
+    port = port or free_port()
+    env = _server_env(warmup)
+    if server == "gunicorn":
+        env["WEB_CONCURRENCY"] = str(workers)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        _server_command(server, port),
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"Server not healthy after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def format_profile(entries: List[Dict], top: int = 25) -> str:
+    report = f"Total import time: {total_import_seconds(entries):.3f}s\n\n"
+    report += f"{'cumulative':>11} {'self':>9}  module\n"
+    for e in sorted(entries, key=lambda e: e["cumulative_seconds"], reverse=True)[:top]:
+        report += f"{e['cumulative_seconds']:>10.3f}s {e['self_seconds']:>8.3f}s  {'  ' * e['depth']}{e['module']}\n"
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile cold start: import-time breakdown and time to first healthy response")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--port", type=int, help="default: any free port")
+    parser.add_argument("--warmup", action="store_true", help="start the background model warm-up as in production")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--skip-server", action="store_true", help="only profile imports")
+    args = parser.parse_args()
+
+    print(format_profile(profile_imports(args.module), args.top))
+    if not args.skip_server:
+        print(f"Time to first healthy response: {time_to_healthy(args.port, warmup=args.warmup, server=args.server):.3f}s")
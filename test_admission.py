@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import AdmissionController, Overloaded, TokenBucket
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # The metrics collector persists its files in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(admission, "SESSION_RATE", 100.0)
+    monkeypatch.setattr(admission, "SESSION_BURST", 100.0)
+    monkeypatch.setattr(admission, "GLOBAL_RATE", 100.0)
+    monkeypatch.setattr(admission, "GLOBAL_BURST", 100.0)
+    monkeypatch.setattr(admission, "MAX_IN_FLIGHT", 1)
+    monkeypatch.setattr(admission, "MAX_QUEUE", 2)
+    monkeypatch.setattr(admission, "QUEUE_DEADLINE", 10.0)
+
+def shed(controller, session_id="s"):
+    async def attempt():
+        async with controller.admit(session_id):
+            pass
+    with pytest.raises(Overloaded) as info:
+        asyncio.run(attempt())
+    return info.value
+
+def test_token_bucket_refuses_when_empty_and_reports_wait():
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.try_acquire() == (True, 0.0)
+    assert bucket.try_acquire() == (True, 0.0)
+    ok, retry_after = bucket.try_acquire()
+    assert not ok
+    assert 0 < retry_after <= 0.5
+
+def test_retry_after_is_rounded_up_to_whole_seconds():
+    assert Overloaded(429, 0.2, "x").retry_after == 1
+    assert Overloaded(503, 2.1, "x").retry_after == 3
+
+def test_session_rate_limit(monkeypatch):
+    monkeypatch.setattr(admission, "SESSION_RATE", 0.5)
+    monkeypatch.setattr(admission, "SESSION_BURST", 1)
+    controller = AdmissionController()
+
+    async def once():
+        async with controller.admit("alice"):
+            pass
+    asyncio.run(once())
+    error = shed(controller, "alice")
+    assert (error.status_code, error.reason, error.retry_after) == (429, "session_rate_limited", 2)
+
+    async def other_session():
+        async with controller.admit("bob"):
+            pass
+    # Other sessions keep their own budget
+    asyncio.run(other_session())
+
+def test_global_rate_limit(monkeypatch):
+    monkeypatch.setattr(admission, "GLOBAL_RATE", 1)
+    monkeypatch.setattr(admission, "GLOBAL_BURST", 1)
+    controller = AdmissionController()
+    controller.global_bucket.try_acquire()
+    error = shed(controller, "bob")
+    assert (error.status_code, error.reason) == (429, "global_rate_limited")
+
+def test_queue_accounting_and_queue_full():
+    controller = AdmissionController()
+
+    async def scenario():
+        release = asyncio.Event()
+        depth = []
+
+        async def hold():
+            async with controller.admit("a"):
+                await release.wait()
+
+        async def queued():
+            async with controller.admit("b"):
+                depth.append((controller.in_flight, controller.waiting))
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.ensure_future(queued()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        try:
+            assert (controller.in_flight, controller.waiting) == (1, 2)
+
+            # A third waiter would exceed MAX_QUEUE
+            with pytest.raises(Overloaded) as info:
+                async with controller.admit("c"):
+                    pass
+            assert (info.value.status_code, info.value.reason) == (503, "queue_full")
+        finally:
+            release.set()
+        await asyncio.gather(holder, *waiters)
+        assert depth == [(1, 1), (1, 0)]
+        assert (controller.in_flight, controller.waiting) == (0, 0)
+
+    asyncio.run(scenario())
+
+def test_deadline_precheck_sheds_without_waiting(monkeypatch):
+    monkeypatch.setattr(admission, "QUEUE_DEADLINE", 1.0)
+    controller = AdmissionController()
+    controller.in_flight = 1
+    controller.avg_service_time = 5.0
+    error = shed(controller)
+    assert (error.status_code, error.reason, error.retry_after) == (503, "deadline", 5)
+    assert controller.waiting == 0
+
+def test_deadline_timeout_while_queued(monkeypatch):
+    monkeypatch.setattr(admission, "QUEUE_DEADLINE", 0.05)
+    controller = AdmissionController()
+    controller.avg_service_time = 0.0
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit("a"):
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(Overloaded) as info:
+                async with controller.admit("b"):
+                    pass
+            assert (info.value.status_code, info.value.reason) == (503, "deadline")
+            assert controller.waiting == 0
+        finally:
+            release.set()
+        await holder
+
+    asyncio.run(scenario())
+
+def test_shed_request_gives_back_rate_limit_tokens(monkeypatch):
+    monkeypatch.setattr(admission, "SESSION_BURST", 1)
+    monkeypatch.setattr(admission, "MAX_QUEUE", 0)
+    controller = AdmissionController()
+    controller.in_flight = 1  # every slot busy, no room to queue
+    error = shed(controller, "alice")
+    assert error.reason == "queue_full"
+
+    # The shed attempt didn't use up alice's single-request burst
+    controller.in_flight = 0
+    async def once():
+        async with controller.admit("alice"):
+            pass
+    asyncio.run(once())
+
+def test_crisis_log_failure_is_reported_not_raised(monkeypatch):
+    pytest.importorskip("fastapi")
+    monkeypatch.setenv("WARMUP_MODELS", "0")
+    import main
+
+    def failing_log(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(main, "log_chat", failing_log)
+
+    result = asyncio.run(main.crisis_response("s", "I feel hopeless"))
+    assert result == {"response": main.SAFETY_MESSAGE}
+    assert main.get_collector().counters["crisis_log_failures"] >= 1
+
+def test_limits_are_split_between_workers(monkeypatch):
+    monkeypatch.setattr(admission, "WORKERS", 4)
+    monkeypatch.setattr(admission, "SESSION_RATE", 2.0)
+    monkeypatch.setattr(admission, "SESSION_BURST", 8.0)
+    controller = AdmissionController()
+    assert (controller.global_bucket.rate, controller.global_bucket.capacity) == (25.0, 25.0)
+    bucket = controller._session_bucket("alice")
+    assert (bucket.rate, bucket.capacity) == (0.5, 2.0)
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+
+import pytest
+
+import admission
+import batch
+from admission import AdmissionController
+from crisis import SAFETY_MESSAGE
+from models import BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS, BatchChatRequest
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # The metrics collector persists its files in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(admission, "GLOBAL_RATE", 1000.0)
+    monkeypatch.setattr(admission, "GLOBAL_BURST", 1000.0)
+    monkeypatch.setattr(batch, "admission", AdmissionController())
+    monkeypatch.setattr(batch, "log_chat", lambda *args, **kwargs: None)
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Stub get_response: sleeps for the seconds in "delay:<s>" queries, fails on "fail" """
+    calls = []
+    lock = threading.Lock()
+
+    def fake_get_response(session_id, user_query, persist=True):
+        with lock:
+            calls.append((session_id, user_query, persist))
+        if user_query.startswith("delay:"):
+            time.sleep(float(user_query.split(":")[1]))
+        if user_query == "fail":
+            raise RuntimeError("model unavailable")
+        return f"answer to {user_query}"
+    monkeypatch.setattr(batch, "get_response", fake_get_response)
+    return calls
+
+def run(items, concurrency=8):
+    lines = list(batch.to_ndjson(batch.run_chat_batch(items, concurrency)))
+    return [json.loads(line) for line in lines]
+
+def test_results_stream_in_completion_order(calls):
+    results = run([
+        {"id": "slow", "query": "delay:0.3"},
+        {"id": "fast", "query": "delay:0.05"},
+        {"id": "instant", "query": "delay:0"},
+    ])
+    assert [r["id"] for r in results] == ["instant", "fast", "slow"]
+    assert {r["index"] for r in results} == {0, 1, 2}
+    assert results[0]["response"] == "answer to delay:0"
+
+def test_turns_in_one_session_run_in_order(calls):
+    items = [{"session_id": "alice", "query": f"delay:{0.05 * (3 - i)}"} for i in range(3)]
+    items.append({"session_id": "bob", "query": "delay:0"})
+    results = run(items)
+    alice = [query for session_id, query, _ in calls if session_id == "alice"]
+    assert alice == [item["query"] for item in items[:3]]
+    assert [r["index"] for r in results if r["index"] < 3] == [0, 1, 2]
+
+def test_items_without_session_are_not_persisted(calls):
+    run([{"query": "a"}, {"session_id": "alice", "query": "b"}])
+    persisted = {query: persist for _, query, persist in calls}
+    assert persisted == {"a": False, "b": True}
+
+def test_crisis_items_get_safety_message(calls):
+    results = run([{"id": "c", "query": "I feel hopeless"}, {"id": "ok", "query": "hi"}])
+    crisis = next(r for r in results if r["id"] == "c")
+    assert crisis["response"] == SAFETY_MESSAGE and crisis["crisis"] is True
+    assert [query for _, query, _ in calls] == ["hi"]
+
+def test_errors_are_reported_per_item(calls):
+    results = {r["id"]: r for r in run([{"id": "bad", "query": "fail"}, {"id": "good", "query": "hi"}])}
+    assert results["bad"]["error"] == "model unavailable"
+    assert results["good"]["response"] == "answer to hi"
+
+def test_batch_items_leave_reserve_and_are_shed_when_exhausted(calls, monkeypatch):
+    monkeypatch.setattr(admission, "GLOBAL_RATE", 0.01)
+    monkeypatch.setattr(admission, "GLOBAL_BURST", 4)
+    monkeypatch.setattr(admission, "BATCH_RESERVE", 0.5)
+    monkeypatch.setattr(admission, "BATCH_WAIT", 0.1)
+    controller = AdmissionController()
+    monkeypatch.setattr(batch, "admission", controller)
+
+    results = run([{"id": str(i), "query": f"q{i}"} for i in range(4)])
+    answered = [r for r in results if "response" in r]
+    shed = [r for r in results if "error" in r]
+    # Half the burst stays available for interactive requests
+    assert len(answered) == 2 and len(calls) == 2
+    assert all(r["error"] == "batch_rate_limited" and r["status"] == 429 for r in shed)
+    assert controller.global_bucket.try_acquire() == (True, 0.0)
+
+def test_batch_items_back_off_until_tokens_refill(calls, monkeypatch):
+    monkeypatch.setattr(admission, "GLOBAL_RATE", 20)
+    monkeypatch.setattr(admission, "GLOBAL_BURST", 2)
+    monkeypatch.setattr(batch, "admission", AdmissionController())
+    started = time.monotonic()
+    results = run([{"query": f"q{i}"} for i in range(4)])
+    assert all("response" in r for r in results)
+    assert time.monotonic() - started >= 0.1
+
+def test_request_validation():
+    item = {"query": "hi"}
+    assert BatchChatRequest(items=[item]).concurrency == 8
+    with pytest.raises(ValueError):
+        BatchChatRequest(items=[])
+    with pytest.raises(ValueError):
+        BatchChatRequest(items=[item] * (BATCH_MAX_ITEMS + 1))
+    for concurrency in [0, BATCH_MAX_CONCURRENCY + 1]:
+        with pytest.raises(ValueError):
+            BatchChatRequest(items=[item], concurrency=concurrency)
@@ -0,0 +1,56 @@
+import csv
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import log_archive
+
+ROWS = [
+    ["2026-03-01T09:15:00", "alice", "hi", "hello there", "False"],
+    ["2026-03-01T09:45:00", "bob", "I feel hopeless", "safety", "True"],
+    ["2026-03-01T10:05:00", "alice", "thanks", "anytime!", "False"],
+    ["2026-03-02T14:00:00", "carol", "exam stress", "try breathing", "False"],
+]
+
+@pytest.fixture
+def archive(tmp_path):
+    log_file = tmp_path / "chat_log.csv"
+    with open(log_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "session_id", "query", "response", "crisis_flag"])
+        writer.writerows(ROWS)
+
+    archive_dir = str(tmp_path / "archive")
+    assert log_archive.compact(str(log_file), archive_dir, segment_rows=2) == len(ROWS)
+    assert not log_file.exists()
+    return archive_dir
+
+def test_compaction_partitions_by_day(archive):
+    segments = [segment for segment, _ in log_archive.scan(archive)]
+    assert [s.meta["rows"] for s in segments] == [2, 1, 1]
+    assert segments[0].sessions() == ["alice", "bob"]
+
+def test_crisis_rate_by_day(archive):
+    assert log_archive.crisis_rate_by_day(archive_dir=archive) == {
+        "2026-03-01": (3, 1),
+        "2026-03-02": (1, 0),
+    }
+
+def test_time_range_and_crisis_pushdown(archive):
+    assert log_archive.crisis_rate_by_day(archive_dir=archive, since="2026-03-02") == {"2026-03-02": (1, 0)}
+    assert list(log_archive.scan(archive, until="2026-03-01T09:00")) == []
+    crisis_segments = list(log_archive.scan(archive, crisis=True))
+    assert len(crisis_segments) == 1 and crisis_segments[0][1].sum() == 1
+
+def test_sessions_per_hour(archive):
+    assert log_archive.sessions_per_hour(archive_dir=archive) == {
+        "2026-03-01T09": 2,
+        "2026-03-01T10": 1,
+        "2026-03-02T14": 1,
+    }
+
+def test_response_length_stats(archive):
+    stats = log_archive.response_length_stats(archive_dir=archive, crisis=False)
+    assert stats["count"] == 3
+    assert stats["max"] == len("try breathing")
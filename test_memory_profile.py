@@ -0,0 +1,98 @@
+import sys
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("psutil")
+
+import memory_profile
+from memory_profile import MemoryProfiler, deep_sizeof
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # Captures are written to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(memory_profile, "CAPTURE_COOLDOWN", 0)
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+@pytest.fixture
+def profiler():
+    profiler = MemoryProfiler()
+    yield profiler
+    if profiler._alert_timer is not None:
+        profiler._alert_timer.cancel()
+
+def test_deep_sizeof_follows_containers():
+    inner = ["x" * 1000]
+    assert deep_sizeof(inner) == sys.getsizeof(inner) + sys.getsizeof(inner[0])
+    # Shared objects are counted once
+    outer = {"a": inner, "b": inner}
+    assert deep_sizeof(outer) == (sys.getsizeof(outer) + sys.getsizeof("a") + sys.getsizeof("b")
+                                  + deep_sizeof(inner))
+    cycle = []
+    cycle.append(cycle)
+    assert deep_sizeof(cycle) == sys.getsizeof(cycle)
+
+def test_deep_sizeof_stops_at_limit():
+    items = [object() for _ in range(100)]
+    assert deep_sizeof(items, limit=10) < deep_sizeof(items)
+
+def test_start_diff_stop(profiler):
+    with pytest.raises(RuntimeError):
+        profiler.diff()
+    profiler.start()
+    assert profiler.tracing and profiler.baseline is not None
+    held = [bytearray(1024) for _ in range(1000)]
+    top = profiler.diff(top=5)
+    assert top[0]["size_diff_bytes"] >= 1024 * 1000
+    assert "test_memory_profile.py" in top[0]["location"]
+
+    # Without reset the baseline stays put; with it, the next diff starts from here
+    assert profiler.diff(top=1)[0]["size_diff_bytes"] >= 1024 * 1000
+    profiler.diff(reset=True)
+    assert all(stat["size_diff_bytes"] < 1024 * 1000 for stat in profiler.diff())
+    profiler.stop()
+    assert not profiler.tracing and profiler.baseline is None
+    del held
+
+def test_alert_starts_single_frame_tracing_then_diffs_and_stops(profiler):
+    profiler.capture_on_alert("rss high")
+    assert profiler.tracing and profiler.alert_tracing
+    assert tracemalloc.get_traceback_limit() == memory_profile.ALERT_TRACE_FRAMES
+    assert profiler._alert_timer is not None
+
+    held = [bytearray(1024) for _ in range(1000)]
+    profiler.capture_on_alert("rss still high")
+    assert not profiler.tracing and not profiler.alert_tracing
+    assert profiler._alert_timer is None
+
+    first, second = profiler.load_captures()
+    assert first["alert"] == "rss high" and first["diff"] is None
+    assert "components" in first["report"]
+    assert second["diff"][0]["size_diff_bytes"] >= 1024 * 1000
+    del held
+
+def test_alert_tracing_stops_after_window(profiler, monkeypatch):
+    monkeypatch.setattr(memory_profile, "ALERT_TRACE_WINDOW", 0.05)
+    profiler.capture_on_alert("rss high")
+    profiler._alert_timer.join(1)
+    assert not profiler.tracing and profiler._alert_timer is None
+
+def test_admin_tracing_is_left_running(profiler):
+    profiler.start()
+    baseline = profiler.baseline
+    profiler.capture_on_alert("rss high")
+    profiler.capture_on_alert("rss still high")
+
+    assert profiler.tracing and not profiler.alert_tracing
+    assert profiler.baseline is baseline
+    assert profiler._alert_timer is None
+    assert [capture["diff"] is not None for capture in profiler.load_captures()] == [True, True]
+
+def test_cooldown_allows_one_capture(profiler, monkeypatch):
+    monkeypatch.setattr(memory_profile, "CAPTURE_COOLDOWN", 300)
+    profiler.capture_on_alert("rss high")
+    profiler.capture_on_alert("rss high")
+    assert len(profiler.load_captures()) == 1
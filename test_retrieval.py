@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("nltk")
+
+from retrieval import compress_context, estimate_tokens, mmr_select, remove_near_duplicates, trim_to_budget
+
+def test_remove_near_duplicates_keeps_first_of_each_group():
+    embeddings = np.array([
+        [1.0, 0.0],
+        [0.999, 0.01],   # near-duplicate of the first
+        [0.0, 1.0],
+        [2.0, 0.0],      # same direction as the first, different norm
+    ])
+    assert remove_near_duplicates(embeddings) == [0, 2]
+    assert remove_near_duplicates(np.zeros((0, 2))) == []
+
+def test_mmr_select_prefers_diverse_chunks():
+    query = np.array([1.0, 0.5])
+    embeddings = np.array([
+        [1.0, 0.5],
+        [1.0, 0.52],     # almost the same as the first
+        [0.5, 1.0],
+    ])
+    assert mmr_select(query, embeddings, top_k=2, lambda_mult=0.3) == [0, 2]
+    # Pure relevance ignores redundancy
+    assert mmr_select(query, embeddings, top_k=2, lambda_mult=1.0) == [0, 1]
+
+def test_mmr_select_respects_top_k():
+    embeddings = np.eye(5)
+    assert len(mmr_select(np.ones(5), embeddings, top_k=3)) == 3
+    assert mmr_select(np.ones(5), np.zeros((0, 5))) == []
+
+def test_trim_to_budget_keeps_sentences_in_order():
+    chunks = ["First sentence here. Second sentence here.", "Third chunk sentence."]
+    assert trim_to_budget(chunks, 1000) == ["First sentence here. Second sentence here.", "Third chunk sentence."]
+    assert trim_to_budget(chunks, estimate_tokens("First sentence here.")) == ["First sentence here."]
+
+def test_trim_to_budget_truncates_oversized_top_chunk():
+    chunks = ["A" * 3000 + ". Short follow-up.", "Second chunk sentence. Another one."]
+    trimmed = trim_to_budget(chunks, 100)
+    assert len(trimmed) == 1
+    assert trimmed[0].startswith("AAAA")
+    assert estimate_tokens(trimmed[0]) <= 100
+
+def test_compress_context_zero_budget_is_empty():
+    texts = ["Breathing helps. Sleep helps too."]
+    assert compress_context([1.0, 0.0], texts, [[1.0, 0.0]], budget=0) == ""
+    assert compress_context([1.0, 0.0], texts, [[1.0, 0.0]]) == "Breathing helps. Sleep helps too."
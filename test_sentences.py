@@ -0,0 +1,72 @@
+import os
+import pickle
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("nltk")
+
+import sentences
+from sentences import CompactOrthoContext
+from text_column import map_text_column, write_text_column
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "stress_management.txt")
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(sentences, "PUNKT_CACHE_DIR", str(tmp_path / "punkt"))
+    monkeypatch.setattr(sentences, "_tokenizers", {})
+
+def pickled_tokenizer(language):
+    with open(sentences._source_pickle(language), "rb") as f:
+        return pickle.load(f)
+
+def compact_context(tmp_path, mapping):
+    keys = sorted(mapping)
+    write_text_column(str(tmp_path), "keys", keys)
+    blob, offsets = map_text_column(str(tmp_path), "keys")
+    return CompactOrthoContext(blob, offsets, np.array([mapping[key] for key in keys], dtype=np.int32))
+
+@pytest.mark.parametrize("language", ["english", "german"])
+def test_every_ortho_key_matches_the_pickle(language):
+    expected = pickled_tokenizer(language)._params.ortho_context
+    context = sentences.load_compact_params(language).ortho_context
+    assert len(context) == len(expected)
+    assert all(context[key] == value for key, value in expected.items())
+
+def test_binary_search_over_mapped_blob(tmp_path):
+    # Non-ASCII keys check that byte order and str order agree
+    mapping = {"apple": 1, "b": 2, "banana": 3, "zebra": 4, "über": 5, "éclair": 6, "a": 7}
+    context = compact_context(tmp_path, mapping)
+    assert {key: context[key] for key in mapping} == mapping
+    assert context.get("banana", 99) == 3
+
+def test_missing_keys_are_zero(tmp_path):
+    context = compact_context(tmp_path, {"b": 2, "d": 4})
+    for key in ["", "a", "c", "bb", "e", "ü"]:
+        assert context[key] == 0
+        assert context.get(key, -1) == -1
+
+def test_empty_blob(tmp_path):
+    context = compact_context(tmp_path, {})
+    assert context.keys == b""
+    assert len(context) == 0
+    assert context["anything"] == 0
+
+def test_tokenizer_output_matches_the_pickle():
+    with open(SAMPLE, encoding="utf-8") as f:
+        text = f.read()
+    text += " Dr. Smith arrived at 5 p.m. on Jan. 3. He said e.g. breathing helps."
+    assert sentences.get_tokenizer().tokenize(text) == pickled_tokenizer("english").tokenize(text)
+
+@pytest.mark.parametrize("text", [
+    "",
+    "   ",
+    "One sentence without a stop",
+    "  Leading space. Two sentences!  Trailing space.  \n",
+    "Dr. Smith said hi.\n\nNew paragraph? Yes.",
+])
+def test_chunks_join_back_into_the_text(text):
+    chunks = sentences.chunk_sentences(text)
+    assert "".join(chunks) == text
+    assert [c.strip() for c in chunks if c.strip()] == sentences.split_sentences(text)
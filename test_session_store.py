@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+import session_store
+from session_store import SessionStore
+
+def message(role, text):
+    return {"role": role, "parts": [text]}
+
+def test_history_round_trip(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.append("alice", [message("user", "hi"), message("model", "hello")])
+    store.append("bob", [message("user", "hey")])
+    assert store.get_history("alice") == [message("user", "hi"), message("model", "hello")]
+    assert store.get_history("nobody") == []
+
+def test_prune_removes_only_idle_sessions(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.append("old", [message("user", "long ago")])
+    store.append("active", [message("user", "long ago")])
+    with store._connect() as conn:
+        conn.execute("UPDATE messages SET created = ?", (time.time() - 1000,))
+    store.append("active", [message("user", "just now")])
+
+    assert store.prune(ttl=500) == 1
+    assert store.get_history("old") == []
+    # A session is kept whole while any of its messages is recent
+    assert len(store.get_history("active")) == 2
+
+def test_append_prunes_periodically(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.append("old", [message("user", "long ago")])
+    with store._connect() as conn:
+        conn.execute("UPDATE messages SET created = 0")
+    monkeypatch.setattr(session_store, "PRUNE_INTERVAL", 0)
+    store.append("new", [message("user", "now")])
+    assert store.get_history("old") == []
+
+def test_existing_database_is_migrated(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                     " session_id TEXT NOT NULL, role TEXT NOT NULL, text TEXT NOT NULL)")
+        conn.execute("INSERT INTO messages (session_id, role, text) VALUES ('alice', 'user', 'hi')")
+    store = SessionStore(path)
+    # Migrated messages count as recent, so they survive the first prune
+    assert store.prune() == 0
+    assert store.get_history("alice") == [message("user", "hi")]
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+import singleflight
+from metrics import get_collector
+from singleflight import SingleFlight, normalize_query
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # The metrics collector persists its files in the working directory
+    monkeypatch.chdir(tmp_path)
+
+def counters(name):
+    counts = get_collector().counters
+    return {outcome: counts.get(f"{name}_{outcome}", 0) for outcome in ["executed", "coalesced", "reused", "bypassed"]}
+
+def run_concurrently(flight, callers, fn, query="How do I sleep better?"):
+    results = [None] * callers
+    errors = [None] * callers
+
+    def call(i):
+        try:
+            results[i] = flight.do_query(query, fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def test_normalize_query():
+    assert normalize_query("  How do I   SLEEP better?? ") == "how do i sleep better"
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test_shared")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    results, errors = run_concurrently(flight, 8, slow)
+    assert results == ["answer"] * 8 and errors == [None] * 8
+    assert len(calls) == 1
+    assert counters("test_shared") == {"executed": 1, "coalesced": 7, "reused": 0, "bypassed": 0}
+
+def test_result_reused_within_window_then_recomputed():
+    flight = SingleFlight("test_reuse", reuse_window=0.1)
+    calls = []
+
+    def answer():
+        calls.append(1)
+        return f"answer {len(calls)}"
+
+    assert flight.do_query("Exam stress?", answer) == "answer 1"
+    assert flight.do_query("exam   stress", answer) == "answer 1"
+    time.sleep(0.15)
+    assert flight.do_query("Exam stress?", answer) == "answer 2"
+    assert counters("test_reuse") == {"executed": 2, "coalesced": 0, "reused": 1, "bypassed": 0}
+
+def test_exception_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight("test_error")
+
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("model unavailable")
+
+    results, errors = run_concurrently(flight, 4, failing)
+    assert results == [None] * 4
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    # The failure is not reused: the next call executes again
+    assert flight.do_query("How do I sleep better?", lambda: "recovered") == "recovered"
+    assert counters("test_error")["executed"] == 2
+
+def test_crisis_queries_bypass_coalescing():
+    flight = SingleFlight("test_crisis")
+    calls = []
+
+    def answer():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    run_concurrently(flight, 3, answer, query="I feel hopeless")
+    flight.do_query("I feel hopeless", answer)
+    assert len(calls) == 4
+    assert counters("test_crisis") == {"executed": 0, "coalesced": 0, "reused": 0, "bypassed": 4}
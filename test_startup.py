@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from startup_profile import profile_imports, time_to_healthy, total_import_seconds
+
+pytest.importorskip("fastapi")
+pytest.importorskip("uvicorn")
+
+# Cold start budgets in seconds (override for slower CI machines)
+IMPORT_BUDGET = float(os.environ.get("STARTUP_IMPORT_BUDGET", 3.0))
+HEALTHY_BUDGET = float(os.environ.get("STARTUP_HEALTHY_BUDGET", 8.0))
+
+# Modules that must only load on first use or in the background warm-up
+DEFERRED_MODULES = ["torch", "transformers", "llama_index", "google.generativeai"]
+
+# Each test runs in tmp_path so the session database and metrics files stay out of the checkout
+
+def test_heavy_modules_not_imported_at_startup(tmp_path):
+    imported = {entry["module"] for entry in profile_imports("main", cwd=str(tmp_path))}
+    assert not imported & set(DEFERRED_MODULES)
+
+def test_import_within_budget(tmp_path):
+    assert total_import_seconds(profile_imports("main", cwd=str(tmp_path))) < IMPORT_BUDGET
+
+def test_time_to_first_healthy_response_within_budget(tmp_path):
+    assert time_to_healthy(cwd=str(tmp_path)) < HEALTHY_BUDGET
+
+def test_gunicorn_deploy_config_healthy_within_budget(tmp_path, monkeypatch):
+    # The start command Render runs, with its default settings (two workers, no model preloading)
+    pytest.importorskip("gunicorn")
+    monkeypatch.delenv("PRELOAD_MODELS", raising=False)
+    assert time_to_healthy(cwd=str(tmp_path), server="gunicorn", workers=2) < HEALTHY_BUDGET
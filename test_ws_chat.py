@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import WebSocketDisconnect
+
+import main
+import ws_chat
+from admission import AdmissionController
+
+DISCONNECT = object()
+TOKENS = ["I ", "hear ", "you. ", "Let's ", "breathe."]
+
+class FakeSocket:
+    """Stands in for a Starlette WebSocket: a queue of client messages and a list of sent ones"""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+        self.closed_with = None
+        self.dropped = False
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.dropped:
+            raise RuntimeError("connection closed")
+        self.sent.append(message)
+
+    async def receive_json(self):
+        message = await self.incoming.get()
+        if message is DISCONNECT:
+            self.dropped = True
+            raise WebSocketDisconnect()
+        return message
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+    async def wait_for(self, predicate, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for message in self.sent:
+                if predicate(message):
+                    return message
+            await asyncio.sleep(0.01)
+        raise AssertionError(f"no matching message in {self.sent}")
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "admission", AdmissionController())
+    monkeypatch.setattr(main, "log_chat", lambda *args: None)
+    monkeypatch.setattr(ws_chat, "_streams", {})
+    calls = []
+
+    def fake_stream_response(session_id, user_query):
+        calls.append(user_query)
+        for token in TOKENS:
+            time.sleep(0.05)
+            yield token
+    monkeypatch.setattr(main, "stream_response", fake_stream_response)
+    return calls
+
+def connect(session_id=None, last_seq=0, resume_token=None):
+    socket = FakeSocket()
+    handler = asyncio.ensure_future(main.chat_websocket(socket, session_id, last_seq, resume_token))
+    return socket, handler
+
+async def disconnect(socket, handler):
+    await socket.incoming.put(DISCONNECT)
+    await handler
+
+def numbered(socket):
+    return [m for m in socket.sent if "seq" in m]
+
+def test_turn_streams_tokens_in_seq_order():
+    async def scenario():
+        socket, handler = connect("alice")
+        greeting = await socket.wait_for(lambda m: m["type"] == "session")
+        assert greeting["session_id"] == "alice" and greeting["resume_token"]
+
+        await socket.incoming.put({"type": "chat", "query": "I can't sleep"})
+        done = await socket.wait_for(lambda m: m["type"] == "done")
+        assert done["response"] == "".join(TOKENS)
+        messages = numbered(socket)
+        assert [m["seq"] for m in messages] == list(range(1, len(TOKENS) + 2))
+        assert [m["text"] for m in messages[:-1]] == TOKENS
+        await disconnect(socket, handler)
+
+    asyncio.run(scenario())
+
+def test_replay_after_mid_turn_disconnect():
+    async def scenario():
+        first, handler = connect("bob")
+        greeting = await first.wait_for(lambda m: m["type"] == "session")
+        await first.incoming.put({"type": "chat", "query": "exam stress"})
+        await first.wait_for(lambda m: m["type"] == "token")
+        await disconnect(first, handler)
+
+        # Reconnect while the turn is still generating
+        second, handler = connect("bob", last_seq=1, resume_token=greeting["resume_token"])
+        await second.wait_for(lambda m: m["type"] == "done")
+        seqs = [m["seq"] for m in numbered(second)]
+        assert seqs == list(range(2, len(TOKENS) + 2))
+        assert second.sent[0]["type"] == "session"
+        await disconnect(second, handler)
+
+    asyncio.run(scenario())
+
+def test_resume_requires_the_session_token():
+    async def scenario():
+        owner, handler = connect("carol")
+        await owner.wait_for(lambda m: m["type"] == "session")
+
+        for token in [None, "guessed"]:
+            intruder, intruder_handler = connect("carol", resume_token=token)
+            await intruder_handler
+            assert intruder.closed_with == 4403
+            assert [m["type"] for m in intruder.sent] == ["error"]
+        # The owner's connection is untouched
+        assert ws_chat._streams["carol"].socket is owner
+        await disconnect(owner, handler)
+
+    asyncio.run(scenario())
+
+def test_second_chat_during_turn_is_refused_and_pings_answered(isolated):
+    async def scenario():
+        socket, handler = connect("dave")
+        await socket.incoming.put({"type": "chat", "query": "first"})
+        await socket.wait_for(lambda m: m["type"] == "token")
+        await socket.incoming.put({"type": "chat", "query": "second"})
+        await socket.incoming.put({"type": "ping"})
+
+        error = await socket.wait_for(lambda m: m.get("status") == 409)
+        pong = await socket.wait_for(lambda m: m["type"] == "pong")
+        # Both answered while the first turn was still running
+        done_index = next((i for i, m in enumerate(socket.sent) if m["type"] == "done"), len(socket.sent))
+        assert socket.sent.index(error) < done_index and socket.sent.index(pong) < done_index
+        await socket.wait_for(lambda m: m["type"] == "done")
+        assert isolated == ["first"]
+        await disconnect(socket, handler)
+
+    asyncio.run(scenario())
+
+def test_crisis_message_gets_safety_message_without_generation(isolated):
+    async def scenario():
+        socket, handler = connect("erin")
+        await socket.incoming.put({"type": "chat", "query": "I feel hopeless"})
+        done = await socket.wait_for(lambda m: m["type"] == "done")
+        assert done["response"] == main.SAFETY_MESSAGE
+        assert isolated == []
+        await disconnect(socket, handler)
+
+    asyncio.run(scenario())
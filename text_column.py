@@ -0,0 +1,30 @@
+import mmap
+import os
+from typing import List, Union
+
+import numpy as np
+
+
+def write_text_column(directory: str, name: str, values: List[str]):
+    """Arrow-style variable-length column: <name>.bin holds the UTF-8 values back to back,
+    <name>_offsets.npy holds int64 offsets (value i is bin[offsets[i]:offsets[i + 1]])"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+def map_text_column(directory: str, name: str):
+    """(blob, offsets) for a column written by write_text_column, both memory-mapped"""
+    offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+    return _map_blob(os.path.join(directory, f"{name}.bin")), offsets
+
+
+def _map_blob(path: str) -> Union[bytes, mmap.mmap]:
+    with open(path, "rb") as f:
+        # mmap can't map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
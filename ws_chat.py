@@ -0,0 +1,102 @@
+import asyncio
+import hmac
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+
+# WebSocket conversation settings
+KEEPALIVE_INTERVAL = 25      # seconds of silence before the server pings the client
+REPLAY_BUFFER_SIZE = 512     # outbound messages kept per session for resumable reconnect
+STREAM_IDLE_SECONDS = 900    # drop replay buffers for sessions unused for this long
+
+
+class SessionStream:
+    """Outbound messages for one session, numbered so a reconnecting client can resume"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.buffer = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self.last_seq = 0
+        self.updated = time.monotonic()
+        self.socket: Optional[WebSocket] = None
+        # Issued in the greeting; required to resume, since session ids are chosen by clients
+        self.resume_token = secrets.token_urlsafe(24)
+        self.turn: Optional[asyncio.Task] = None
+        # Serializes writes so replayed and live messages reach the client in seq order
+        self._send_lock = asyncio.Lock()
+
+    def push(self, message: Dict) -> Dict:
+        """Number and buffer an outbound message"""
+        self.last_seq += 1
+        message["seq"] = self.last_seq
+        self.buffer.append(message)
+        self.updated = time.monotonic()
+        return message
+
+    def replay(self, after_seq: int) -> List[Dict]:
+        """Buffered messages the client has not seen yet"""
+        return [message for message in self.buffer if message["seq"] > after_seq]
+
+    def can_resume(self, resume_token: Optional[str]) -> bool:
+        return resume_token is not None and hmac.compare_digest(resume_token.encode(), self.resume_token.encode())
+
+    async def attach(self, socket: WebSocket, after_seq: int):
+        """Take over the session: greet, replay what the client missed, then go live"""
+        async with self._send_lock:
+            await socket.send_json({
+                "type": "session",
+                "session_id": self.session_id,
+                "resume_token": self.resume_token,
+                "last_seq": self.last_seq
+            })
+            for message in self.replay(after_seq):
+                await socket.send_json(message)
+            self.socket = socket
+
+    def detach(self, socket: WebSocket):
+        if self.socket is socket:
+            self.socket = None
+
+    async def send(self, message: Dict):
+        """Buffer the message and deliver it to the bound connection, if any"""
+        async with self._send_lock:
+            message = self.push(message)
+            socket = self.socket
+            if socket is None:
+                return
+            try:
+                await socket.send_json(message)
+            except Exception:
+                # Client went away; the message stays buffered for replay on reconnect
+                self.detach(socket)
+
+    async def send_control(self, socket: WebSocket, message: Dict):
+        """Unnumbered message (ping, pong, protocol errors) for one connection"""
+        async with self._send_lock:
+            await socket.send_json(message)
+
+
+_streams: Dict[str, SessionStream] = {}
+_streams_lock = threading.Lock()
+
+def get_stream(session_id: str, resume_token: Optional[str] = None) -> Optional[SessionStream]:
+    """Replay buffer for a session, creating it on first connection.
+
+    An existing session is only returned with its resume token; otherwise None.
+    """
+    with _streams_lock:
+        stream = _streams.get(session_id)
+        if stream is not None:
+            return stream if stream.can_resume(resume_token) else None
+
+        cutoff = time.monotonic() - STREAM_IDLE_SECONDS
+        idle = [sid for sid, s in _streams.items() if s.socket is None and s.turn is None and s.updated < cutoff]
+        for sid in idle:
+            del _streams[sid]
+        stream = SessionStream(session_id)
+        _streams[session_id] = stream
+        return stream